@@ -6,6 +6,7 @@ ABOUT_DIR = os.path.join(DIRECTORY, "about")
 __version__ = open(os.path.join(ABOUT_DIR,"version.txt")).read().strip()
 
 # Make the major useful pieces of code available at the package level.
-from qaml.circuit import Circuit
-from qaml.qubo import QUBO, run_qubo
-from qaml.systems import ExhaustiveSearch, QBSolve, QuantumAnnealer
+from qaml.circuit import Circuit, run_many, run_packed
+from qaml.qubo import QUBO, Problem, run_qubo
+from qaml.systems import SampleSet, ExhaustiveSearch, CircuitSearch, SimulatedAnnealing, ParallelTempering, TabuSearch, Decomposition, QBSolve, QuantumAnnealer
+from qaml.samplers import SamplerSession, fake_sampler
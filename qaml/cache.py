@@ -0,0 +1,122 @@
+import os
+
+# Compute a content address (a hex digest) for the given parts. NumPy
+# arrays are hashed by their raw bytes (with dtype and shape), all
+# other parts by their "repr", so callers should provide canonical
+# (sorted) structures.
+def content_hash(*parts):
+    import hashlib
+    digest = hashlib.sha256()
+    for part in parts:
+        if hasattr(part, "tobytes") and hasattr(part, "dtype"):
+            digest.update(f"{part.dtype}{part.shape}".encode())
+            digest.update(part.tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+# Convert "value" into a canonical structure of builtin values whose
+# "repr" is stable across runs (for "content_hash"). Dictionaries and
+# sets are sorted, functions and classes are named by their module and
+# qualified name, and NumPy arrays become lists.
+def canonical(value):
+    if (value is None) or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    if isinstance(value, dict):
+        return ("dict",) + tuple(sorted((repr(canonical(k)), canonical(v))
+                                        for (k, v) in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return ("set",) + tuple(sorted(repr(canonical(v)) for v in value))
+    if isinstance(value, (list, tuple)): return tuple(map(canonical, value))
+    if hasattr(value, "tolist"): return canonical(value.tolist())
+    if callable(value) and hasattr(value, "__qualname__"):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    return repr(value)
+
+# The location and size of the default on-disk result cache.
+default_result_directory = os.path.join("~", ".qaml", "results")
+default_result_bytes = 2**28
+_default_result_cache = None
+
+# Get the (shared) default cache of System samples.
+def default_result_cache():
+    global _default_result_cache
+    if (_default_result_cache is None):
+        _default_result_cache = DiskCache(default_result_directory, max_entries=None,
+                                          max_bytes=default_result_bytes)
+    return _default_result_cache
+
+# A content-addressed store of Python objects on disk. Every entry is
+# a pickle file named by its key inside "directory". Reading an entry
+# marks it as recently used (through its modification time), and
+# writing an entry evicts the least recently used entries beyond
+# "max_entries" (and beyond "max_bytes" of total size, if given).
+class DiskCache:
+    def __init__(self, directory, max_entries=1000, max_bytes=None):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    # The path of the file that holds the entry for "key".
+    def _path(self, key): return os.path.join(self.directory, key + ".pkl")
+
+    def __contains__(self, key): return os.path.exists(self._path(key))
+
+    def __len__(self): return len(self._entries())
+
+    # Get the value stored for "key" (or "default" if there is none).
+    def get(self, key, default=None):
+        import pickle
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f: value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError): return default
+        return value
+
+    # Store "value" for "key" (atomically replacing any existing entry),
+    # then evict the least recently used entries that do not fit.
+    def put(self, key, value):
+        import pickle, tempfile
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as f: pickle.dump(value, f)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            if os.path.exists(temporary): os.remove(temporary)
+            raise
+        self.evict()
+
+    # Remove the entry for "key" if it exists.
+    def remove(self, key):
+        try:             os.remove(self._path(key))
+        except OSError: pass
+
+    # Remove all entries.
+    def clear(self):
+        for (_, _, path) in self._entries(): os.remove(path)
+
+    # Remove the least recently used entries beyond the size limits.
+    def evict(self):
+        entries = sorted(self._entries(), reverse=True)
+        total = 0
+        for i, (_, size, path) in enumerate(entries):
+            total += size
+            if ((self.max_entries is not None) and (i >= self.max_entries)) or \
+               ((self.max_bytes is not None) and (total > self.max_bytes) and (i > 0)):
+                try:             os.remove(path)
+                except OSError: pass
+
+    # Get the (last used time, size, path) of every stored entry.
+    def _entries(self):
+        if (not os.path.isdir(self.directory)): return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if (not name.endswith(".pkl")): continue
+            path = os.path.join(self.directory, name)
+            try:             info = os.stat(path)
+            except OSError: continue
+            entries.append( (info.st_mtime_ns, info.st_size, path) )
+        return entries
@@ -1,9 +1,15 @@
-from itertools import combinations, product
+from itertools import combinations
 from qaml.qubo import QUBO
 
 # Create a "Number" that is fixed point, by default a standard integer.
 # This number supports operations with other number objects and Python
-# integers and floats.
+# integers and floats. A Number is a multilinear polynomial over the
+# bits of the circuit, stored in "terms" as { (bit, ...) : coefficient }
+# with a separate "constant", so products of Numbers are exact and may
+# have higher order terms (they are reduced to quadratic form only when
+# the circuit is assembled). Operations do not compute terms right
+# away, instead they build a lightweight expression graph (held in
+# "_node") that is materialized only once, when the terms are needed.
 class Number:
     def __init__(self, circuit, bit_indices, exponent, signed, constant=0):
         # Store the provided parameters.
@@ -11,137 +17,192 @@ class Number:
         self.bit_indices = bit_indices
         self.exponent    = exponent
         self.signed      = signed
-        self.constant    = constant
-        self.bits        = QUBO()
+        self._node       = None
+        self._constant   = constant
+        self._terms      = {}
         # Initialize the number coefficients itself.
         bits = len(bit_indices)
         for i in range(bits - int(signed)):
             bit = self.bit_indices[i]
-            self.bits[bit] = 2**(i + exponent)
+            self._terms[(bit,)] = 2**(i + exponent)
         if signed:
             bit = self.bit_indices[bits-1]
-            self.bits[bit] = -2**(bits-1 + exponent)
-        # Store which values are one-local.
-        self.one_locals = set(self.bit_indices)
-        
+            self._terms[(bit,)] = -2**(bits-1 + exponent)
+
+    # Construct a new (unevaluated) Number from an expression "node",
+    # either ("linear", [(weight, Number), ...], constant) for weighted
+    # sums or ("product", Number, Number) for products of two Numbers.
+    def _derive(self, node):
+        new_num = Number.__new__(Number)
+        new_num.circuit     = self.circuit
+        new_num.bit_indices = self.bit_indices
+        new_num.exponent    = self.exponent
+        new_num.signed      = self.signed
+        new_num._node       = node
+        return new_num
+
+    # The polynomial terms of this number { (bit, ...) : coefficient }.
+    @property
+    def terms(self):
+        if (self._node is not None): self._materialize()
+        return self._terms
+
+    # The constant term of this number.
+    @property
+    def constant(self):
+        if (self._node is not None): self._materialize()
+        return self._constant
+    @constant.setter
+    def constant(self, value):
+        if (self._node is not None): self._materialize()
+        self._constant = value
+
+    # The highest order of any term of this number.
+    @property
+    def degree(self): return max(map(len, self.terms), default=0)
+
+    # The coefficients of this number as a QUBO (without the constant),
+    # only available when no terms are higher than quadratic.
+    @property
+    def bits(self):
+        if (self.degree > 2):
+            from qaml.exceptions import UsageError
+            raise(UsageError(f"This Number has terms of order {self.degree}, use 'terms' instead of a QUBO."))
+        qubo = QUBO()
+        for term, value in self.terms.items(): qubo[term*(3-len(term))] = value
+        return qubo
+
+    # Evaluate the expression graph of this number (once).
+    def _materialize(self):
+        if (self._node[0] == "product"): self._multiply(*self._node[1:])
+        else:                            self._combine()
+        self._node = None
+
+    # Evaluate a tree of weighted sums. The total weight of every
+    # operand is accumulated from the top of the graph down (so shared
+    # sub-expressions are only visited once), then each leaf (an
+    # evaluated Number or a product) is added in once.
+    def _combine(self):
+        # Order the unevaluated sums so that parents come before children,
+        # and collect the leaves in the order they appear (left to right).
+        order, leaves, seen = [], [], set()
+        stack = [(self, False)]
+        while (len(stack) > 0):
+            num, done = stack.pop()
+            if done: order.append(num); continue
+            if (id(num) in seen): continue
+            seen.add(id(num))
+            if (num._node is None) or (num._node[0] != "linear"):
+                leaves.append(num)
+                continue
+            stack.append( (num, True) )
+            for (_, operand) in reversed(num._node[1]):
+                stack.append( (operand, False) )
+        order.reverse()
+        # Push the weights down from this number to the leaves.
+        weights = {id(self): 1}
+        constant = 0
+        for num in order:
+            weight = weights[id(num)]
+            _, operands, num_constant = num._node
+            constant += num_constant * weight
+            for (w, operand) in operands:
+                weights[id(operand)] = weights.get(id(operand), 0) + w * weight
+        # Add together the (weighted) terms of all leaves.
+        terms = {}
+        for num in leaves:
+            weight = weights[id(num)]
+            for term, value in num.terms.items():
+                if (weight != 1): value = value * weight
+                if term in terms: terms[term] = terms[term] + value
+                else:             terms[term] = value
+            constant += num.constant * weight
+        self._terms, self._constant = terms, constant
+
+    # Evaluate the product of two numbers by multiplying out their
+    # polynomials (using x*x = x for binary variables).
+    def _multiply(self, left, num):
+        left_terms = list(left.terms.items())
+        if (left.constant != 0): left_terms.append( ((), left.constant) )
+        right_terms = list(num.terms.items())
+        if (num.constant != 0): right_terms.append( ((), num.constant) )
+        terms = {}
+        for (t1, v1) in left_terms:
+            for (t2, v2) in right_terms:
+                if (len(t1) + len(t2) == 0): continue
+                term = tuple(sorted(set(t1).union(t2)))
+                terms[term] = terms.get(term, 0) + v1 * v2
+        self._terms = terms
+        self._constant = left.constant * num.constant
+
     # Print out information about this number.
     def __str__(self):
         string  = "Number:\n"
         string += f"  bit_indices: {self.bit_indices}\n"
         string += f"  exponent:    {self.exponent}\n"
         string += f"  signed:      {self.signed}\n"
-        string += f"  bits:        {dict(self.bits)}\n"
+        string += f"  terms:       {self.terms}\n"
         string += f"  constant:    {self.constant}\n"
-        string += f"  one_locals:  {self.one_locals}\n"
         max_len_line = max(map(len, string.split("\n")))
         page_break = '-'*max_len_line+"\n"
         return  page_break + string + page_break
 
     # Addition from the right is the same.
-    def __radd__(self, num): return self._add__(num)
+    def __radd__(self, num): return self.__add__(num)
     # Support addition of another number.
     def __add__(self, num):
         # Verify correct usage.
         assert(type(num) in {type(self), int, float})
-        # Initialize a new Number object to be returned.
-        new_num = Number(self.circuit, self.bit_indices,
-                         self.exponent, self.signed, self.constant)
-        new_num.bits = self.bits.copy()
-        new_num.one_locals = self.one_locals.copy()
-        # Generate a new number that is a copy of this one with a
-        # different constant term added on.
+        # Add a constant term, or sum the two numbers.
         if (type(num) in {int, float}):
-            new_num.constant += num
-        # Perform the addition between the qubits in the QUBO.
-        elif (type(num) == type(self)):
-            # Add together the coefficients of the two QUBO's for each number.
-            for coef in num.bits:
-                new_num.bits[coef] = new_num.bits.get(coef, 0) + num.bits[coef]
-            # Update the one-local terms track for the new number.
-            new_num.one_locals = new_num.one_locals.union(num.one_locals)
-            new_num.constant = self.constant + num.constant
-        # Return the new number.
-        return new_num
+            return self._derive( ("linear", [(1, self)], num) )
+        return self._derive( ("linear", [(1, self), (1, num)], 0) )
 
     # Support subtraction of another number.
     def __sub__(self, num): return self + num.__neg__()
 
     # Support negation of a number.
     def __neg__(self):
-        # Initialize a new Number object to be returned.
-        new_num = Number(self.circuit, self.bit_indices,
-                         self.exponent, self.signed, -self.constant)
-        # Make the QUBO the negation of all values in this QUBO.
-        new_num.bits = QUBO({coef:-self.bits[coef] for coef in self.bits})
-        new_num.one_locals = self.one_locals.copy()
-        return new_num
+        return self._derive( ("linear", [(-1, self)], 0) )
 
-    # Raise this to a power.
+    # Raise this to a (nonnegative integer) power by repeated squaring.
     def __pow__(self, exponent):
         num = 1
-        for i in range(exponent): num = self * num
+        square = self
+        while (exponent > 0):
+            if (exponent % 2): num = square * num
+            exponent //= 2
+            if (exponent > 0): square = square * square
         return num
 
     # Support multiplication with another number.
     def __mul__(self, num):
         # Verify correct usage.
         assert(type(num) in {type(self), int, float})
-        # Initialize a new Number object to be returned.
-        new_num = Number(self.circuit, self.bit_indices,
-                         self.exponent, self.signed, self.constant)
-        new_num.bits = self.bits.copy()
-        new_num.one_locals = self.one_locals.copy()
-        # Generate a new number that is a copy of this one with a
-        # different constant term multiplied on, also multiply QUBO.
+        # Scale by a constant, or multiply the two numbers.
         if (type(num) in {int, float}):
-            new_num.constant *= num
-            for coef in new_num.bits: new_num.bits[coef] *= num
-        # Perform the multiplication between the qubits in the QUBO.
-        elif (type(num) == type(self)):
-            # First compute all the 1-local terms that require no anicillary bits.
-            shared_terms = num.one_locals.intersection(self.one_locals)
-            all_terms = self.one_locals.union(num.one_locals)
-            for coef in all_terms:
-                value = 0
-                if coef in self.one_locals: value += self.bits[coef] * num.constant
-                if coef in num.one_locals:  value += num.bits[coef]  * self.constant
-                if coef in shared_terms:    value += self.bits[coef] * num.bits[coef]
-                new_num.bits[coef] = value
-            # Generate ancillary bits to make all 2-locals into 1-locals.
-            unique_pairs = {(min(c1,c2), max(c1,c2)) for (c1,c2) in product(
-                self.one_locals, num.one_locals) if (c1 != c2)}
-            ancillary_bits = self.circuit.allocate(len(unique_pairs))
-            # Construct the and gates to make new one-local terms.
-            for (c1, c2), a in zip(unique_pairs,ancillary_bits):
-                self.circuit.add_and(c1, c2, a)
-                # Assign the value of the new ancillary bit as their multiplication.
-                if (c1 in self.bits) and (c2 in num.bits):
-                    new_num.bits[a] = self.bits[c1] * num.bits[c2]
-                if (c2 in self.bits) and (c1 in num.bits):
-                    if (a in new_num.bits): new_num.bits[a] *= 2
-                    else: new_num.bits[a] = self.bits[c2] * num.bits[c1]
-            # Update the now one-local terms in the new number.
-            new_num.one_locals = shared_terms.union(ancillary_bits)
-            # Multiply the constants together.
-            new_num.constant = self.constant * num.constant
-        # Return the new number.
-        return new_num
+            return self._derive( ("linear", [(num, self)], 0) )
+        return self._derive( ("product", self, num) )
 
     # Multiplication from the right is the same.
     def __rmul__(self, num): return self.__mul__(num)
 
-    # Generate the squared value energy function QUBO for this number.
+    # Generate the squared value energy function for this number, a
+    # dictionary of { (bit, ...) : coefficient } terms where the empty
+    # term () holds the constant.
     def squared(self):
-        qubo = QUBO()
-        # Square all the one-local terms (including constant interactions).
-        for coef in self.one_locals:
-            qubo[coef] = self.bits[coef]**2 + self.bits[coef]*2*self.constant
-        # Add the interactions for the squared (now two-local) terms.
-        for (c1, c2) in combinations(sorted(self.one_locals), 2):
-            qubo[(c1,c2)] = 2 * self.bits[c1] * self.bits[c2]
-        # Add constant term to QUBO (for squared correctness).
-        qubo["c"] = self.constant**2
-        return qubo
+        squared = {}
+        terms = sorted(self.terms.items())
+        # Square all the terms (including constant interactions).
+        for (term, value) in terms:
+            squared[term] = value**2 + value*2*self.constant
+        # Add the interactions between pairs of terms.
+        for ((t1, v1), (t2, v2)) in combinations(terms, 2):
+            term = tuple(sorted(set(t1).union(t2)))
+            squared[term] = squared.get(term, 0) + 2 * v1 * v2
+        # Add constant term (for squared correctness).
+        squared[()] = self.constant**2
+        return squared
 
 
 # Holder for a Quantum Annealing circuit in QUBO form. Keeps track of
@@ -153,6 +214,20 @@ class Circuit:
         self.numbers = []
         self.equations = []
         self.and_gates = []
+        self.and_indices = []
+        # Cache of { (c1, c2) : ancilla } for every AND gate, the number
+        # of ancillas that multiplying pair by pair would allocate for
+        # the equations, and the number of those that were not needed.
+        self.products = {}
+        self.pairwise_ancillas = 0
+        self.qubits_saved = 0
+        # The (counts, edges) of all state energies from the last run
+        # that enumerated every state (see "ExhaustiveSearch"), and the
+        # search measurements from the last run whose system made them.
+        self.energy_histogram = None
+        self.metrics = None
+        self._compiled = (None, None)
+        self._tables = (None,)
 
     # Generate a collection of bits to be used as ancillary bits.
     def allocate(self, bits):
@@ -166,49 +241,206 @@ class Circuit:
         return self.numbers[-1]
 
 
-    # Add a number that represents an equation to the set of equations.
+    # Add a number that represents an equation to the set of equations
+    # (evaluating its expression graph, which allocates any ancillas).
     def add(self, *args, **kwargs): return self.square(*args, **kwargs)
     def square(self, number):
+        self.pairwise_ancillas += self._pairwise_ancillas(number)
+        if (number._node is not None): number._materialize()
         self.equations.append( number )
 
+    # Count the ancillas that evaluating the expression graph of
+    # "number" would allocate when every product of two Numbers is made
+    # quadratic right away, with one AND gate for each distinct pair of
+    # one-local bits of the two factors (the product is then one-local
+    # in the shared bits and the new ancillas). Sub-expressions that
+    # are already evaluated are treated as one-local in their bits.
+    def _pairwise_ancillas(self, number):
+        from itertools import count
+        fresh = count(-1, -1)
+        one_locals = {}
+        allocated = 0
+        stack = [(number, False)]
+        while (len(stack) > 0):
+            num, done = stack.pop()
+            if (id(num) in one_locals): continue
+            node = num._node
+            if (node is None):
+                one_locals[id(num)] = {b for t in num._terms for b in t}
+                continue
+            operands = [n for (_, n) in node[1]] if (node[0] == "linear") else node[1:]
+            if (not done):
+                stack.append( (num, True) )
+                stack.extend( (n, False) for n in operands )
+                continue
+            if (node[0] == "linear"):
+                one_locals[id(num)] = set().union(*(one_locals[id(n)] for n in operands))
+            else:
+                left, right = (one_locals[id(n)] for n in operands)
+                shared = left.intersection(right)
+                pairs = len(left)*len(right) - len(shared) - len(shared)*(len(shared)-1)//2
+                allocated += pairs
+                one_locals[id(num)] = shared.union(next(fresh) for _ in range(pairs))
+        return allocated
+
     # Construct an "and" gate over two input terms "c1" and "c2" and
     # an output term "a". Store that and gate for later evaluation.
     def add_and(self, c1, c2, a):
         self.and_gates.append(
             QUBO({a:3, (c1,c2):1, (c1,a):-2, (c2,a):-2}) )
+        self.and_indices.append( (c1, c2, a) )
+        self.products.setdefault( (min(c1,c2), max(c1,c2)), a )
+
+    # Get the ancillary bit that holds the product of bits "c1" and
+    # "c2", allocating it (and its AND gate) only the first time.
+    def product(self, c1, c2):
+        key = (min(c1,c2), max(c1,c2))
+        if (key not in self.products):
+            a, = self.allocate(1)
+            self.add_and(key[0], key[1], a)
+        return self.products[key]
+
+    # Reduce a dictionary of polynomial "terms" { (bit, ...) : value }
+    # to quadratic form by substituting the product of a pair of bits
+    # with an ancillary bit (and AND gate), until no term has more than
+    # two bits. Pairs that already have an ancilla are always used
+    # first. Otherwise two greedy orderings are planned (the pair shared
+    # by the most remaining terms, and the same but preferring pairs of
+    # bits from the same Number) and the plan needing the fewest new
+    # ancillas is applied. The ancillas that multiplying pair by pair
+    # would have needed beyond those used here are in "qubits_saved".
+    def quadratize(self, terms):
+        first_new = (self.bits[-1] + 1) if (len(self.bits) > 0) else 0
+        owner = {b : i for (i, n) in enumerate(self.numbers) for b in n.bit_indices}
+        plans = [self._substitutions(terms, first_new, priority) for priority in (
+            lambda p, count: (count, -p[0], -p[1]),
+            lambda p, count: (owner.get(p[0],-1) == owner.get(p[1],-2),
+                              count, -p[0], -p[1]))]
+        pairs, terms, used = min(plans, key=lambda plan: len(plan[0]))
+        self.qubits_saved = max(0, self.pairwise_ancillas - used)
+        # Allocate the planned ancillas (planned bits map to the real ones).
+        rename = {}
+        for (c1, c2, planned) in pairs:
+            rename[planned] = self.product(rename.get(c1,c1), rename.get(c2,c2))
+        if all(k == v for (k,v) in rename.items()): return terms
+        renamed = {}
+        for term, value in terms.items():
+            term = tuple(sorted(rename.get(b,b) for b in term))
+            renamed[term] = renamed.get(term, 0) + value
+        return renamed
+
+    # Plan the pair substitutions that reduce "terms" to quadratic form,
+    # picking the pair with the largest "priority(pair, count)" at each
+    # step (after pairs that already have ancillas). New ancillas are
+    # numbered from "first_new". Returns the list of new (bit, bit,
+    # ancilla) substitutions, the reduced terms, and the number of
+    # ancillas (new or existing) that the reduced terms use.
+    def _substitutions(self, terms, first_new, priority):
+        terms = dict(terms)
+        products = dict(self.products)
+        new_pairs = []
+        used = set()
+        high = {t for t in terms if (len(t) > 2)}
+        while (len(high) > 0):
+            # Drop high order terms that have no weight.
+            for t in [t for t in high if (terms[t] == 0)]:
+                terms.pop(t); high.discard(t)
+            if (len(high) == 0): break
+            # Count how many high order terms contain each pair of bits.
+            counts = {}
+            for t in high:
+                for pair in combinations(t, 2):
+                    counts[pair] = counts.get(pair, 0) + 1
+            pair = max(counts, key=lambda p: (p in products, priority(p, counts[p])))
+            if (pair not in products):
+                products[pair] = first_new + len(new_pairs)
+                new_pairs.append( pair + (products[pair],) )
+            a = products[pair]
+            used.add(a)
+            # Substitute the ancilla for the pair in every term containing it.
+            for t in [t for t in high if (pair[0] in t) and (pair[1] in t)]:
+                value = terms.pop(t)
+                high.discard(t)
+                term = tuple(sorted(set(t).difference(pair).union((a,))))
+                terms[term] = terms.get(term, 0) + value
+                if (len(term) > 2): high.add(term)
+        return new_pairs, terms, len(used)
+
+    # Get the strength of each AND gate (keyed by its output bit) for the
+    # quadratic "terms". Breaking a gate raises its penalty by at least
+    # its strength, while it can lower the rest of the energy by at most
+    # the total magnitude of the other coefficients on its output bit
+    # (a Rosenberg bound), so each gate gets that total plus the margin
+    # "and_strength". Then no state that breaks a gate can have lower
+    # energy than the best state that keeps all gates. Later gates may
+    # use the outputs of earlier gates as inputs, so the strengths are
+    # computed from the last gate to the first.
+    def _and_strengths(self, terms, and_strength):
+        bound = {}
+        for term, value in terms.items():
+            for b in set(term): bound[b] = bound.get(b, 0) + abs(value)
+        strengths = {}
+        for (c1, c2, a) in reversed(self.and_indices):
+            strengths[a] = bound.get(a, 0) + and_strength
+            # The penalty of this gate has weight 3 on terms with each input.
+            for c in (c1, c2): bound[c] = bound.get(c, 0) + 3 * strengths[a]
+        return strengths
 
     # Generate the squared value energy function QUBO for this number.
+    # Every AND gate penalty is its bound (see "_and_strengths") plus a
+    # margin of "and_strength" times the largest Ising weight of the
+    # squared equations (see "run").
     def assemble(self, and_strength, verbose=True):
         from qaml.qubo import qubo_ising_rescale_factor
+        # Sum the squared equations, then reduce them to quadratic form.
+        terms = {}
+        for n in self.equations:
+            for term, value in n.squared().items():
+                if term in terms: terms[term] = terms[term] + value
+                else:             terms[term] = value
+        terms = self.quadratize(terms)
         # Compute the qubo without the and-gate rescale.
         q = QUBO()
-        for n in self.equations:
-            q += n.squared()
-        # Set the rescale to the max Ising weight.
+        for term, value in terms.items():
+            if (len(term) == 0): q["c"] = value
+            else:                q[term*(3-len(term))] = value
+        # Set the rescale to the max Ising weight, then make every AND
+        # gate strong enough that the ground state keeps all the gates.
         and_strength *= qubo_ising_rescale_factor(q)
+        strengths = self._and_strengths(terms, and_strength)
+        strengths = [strengths[a] for (_, _, a) in self.and_indices]
         if (len(self.and_gates) > 0) and verbose:
-            print(f"\nUsing and strength {and_strength:.2f}.")
+            print(f"\nUsing and strengths {min(strengths):.2f} to {max(strengths):.2f}.")
+            if (self.qubits_saved > 0):
+                print(f"Reused AND gates saved {self.qubits_saved} qubits.")
 
         # Generate a qubo for the squared value function.
         # This is where the computation of the AND gates happens.
-        q = QUBO()
-        # Add 0 times all numbers to ensure all coefficients are included.
-        for n in self.numbers:
-            q += 0 * n.bits
-        # Add all of the squared equations.
-        for n in self.equations:
-            q += n.squared()
-        # Add all of the and gates with the specified strength.
-        for gate in self.and_gates:
-            q += gate * and_strength
-        return q
-
-    # Get the names of the Number objects in the user function that
-    # called this circuit (but not this function directly).
-    def _num_names(self):
-        import inspect
+        # Add 0 times all numbers to ensure all coefficients are included,
+        # then all of the squared equations, then all of the and gates
+        # with their strengths.
+        return QUBO.sum([n.bits for n in self.numbers] + [q] + self.and_gates,
+                        [0] * len(self.numbers) + [1] + strengths)
+
+    # Compile this circuit into an immutable Problem (holding the QUBO
+    # index arrays, Ising form, rescale factor, and AND gate table) that
+    # is reused by every stage of a run. The result is cached until
+    # the circuit changes or a different "and_strength" is requested
+    # (see "run" for its meaning).
+    def compile(self, and_strength=1/2, verbose=True):
+        from qaml.qubo import Problem
+        key = lambda: (and_strength, len(self.bits), len(self.numbers),
+                       len(self.equations), len(self.and_gates))
+        if (self._compiled[0] != key()):
+            qubo = self.assemble(and_strength=and_strength, verbose=verbose)
+            # (assembling may allocate ancillas, so get the key after)
+            self._compiled = (key(), Problem(qubo, and_gates=self.and_indices))
+        return self._compiled[1]
+
+    # Get the names of the Number objects in the local variables of the
+    # user function that called this circuit.
+    def _num_names(self, user_locals):
         names = []
-        user_locals = inspect.currentframe().f_back.f_back.f_locals
         # Cycle all the Number objects in this circuit.
         for i in range(len(self.numbers)):
             num = self.numbers[i]
@@ -216,49 +448,81 @@ class Circuit:
                                          if user_locals[name] is num])[-1] )
         return names
 
+    # Get the compiled Problem of this circuit, compiling it (quietly,
+    # with the default "and_strength") only if the circuit has changed
+    # since it was last compiled.
+    def _problem(self):
+        key, problem = self._compiled
+        if (key is None) or (key[1:] != (len(self.bits), len(self.numbers),
+                                         len(self.equations), len(self.and_gates))):
+            problem = self.compile(verbose=False)
+        return problem
+
+    # Build (once per circuit layout) the arrays used for decoding, a
+    # (num bits, num numbers) matrix of the value of each bit in each
+    # Number and the Number constants. The AND gates are decoded from
+    # the "and_gates" table of the compiled Problem.
+    def _decode_tables(self):
+        import numpy as np
+        key = (len(self.bits), len(self.numbers))
+        if (self._tables[0] != key):
+            weights = np.zeros((len(self.bits), len(self.numbers)))
+            for i, num in enumerate(self.numbers):
+                for j, idx in enumerate(num.bit_indices):
+                    weights[idx,i] = 2.0**(j+num.exponent)
+                if num.signed: weights[num.bit_indices[-1],i] *= -1
+            constants = np.array([num.constant for num in self.numbers], dtype=float)
+            self._tables = (key, weights, constants)
+        return self._tables[1:]
+
+    # Given a (num samples, num bits) matrix of states of this circuit,
+    # decode all of them at once. Returns the (num samples, num numbers)
+    # array of Number values, a copy of the bits with all broken AND
+    # gates repaired, and the percentage of AND gates that were broken
+    # in each sample (None when there are no AND gates). The AND gates
+    # are those of the compiled "problem" (this circuit's by default).
+    def decode_batch(self, bit_matrix, problem=None):
+        import numpy as np
+        bits = np.array(bit_matrix, dtype=np.uint8)
+        if (bits.size == 0): bits = bits.reshape(0, len(self.bits))
+        # Check to see if length of the bit sequences is valid.
+        if (bits.ndim != 2) or (bits.shape[1] != len(self.bits)):
+            raise(IndexError(f"The provided bits have length {bits.shape[-1]}, but this circuit has {len(self.bits)} bits."))
+        if (problem is None): problem = self._problem()
+        weights, constants = self._decode_tables()
+        gates = problem.and_gates
+        # Compute the value of the numbers (encode them back into decimal).
+        values = bits @ weights + constants
+        if (len(gates) == 0): return values, bits, None
+        # Fix all of the failed and gates (in order, so gates that use
+        # the output of earlier gates see the repaired value).
+        failed = np.zeros(len(bits), dtype=int)
+        for (c1, c2, a) in gates.tolist():
+            correct = bits[:,c1] & bits[:,c2]
+            failed += (bits[:,a] != correct)
+            bits[:,a] = correct
+        return values, bits, 100 * failed / len(gates)
+
+    # Given the rows of values from "decode_batch", convert them into
+    # lists of Python numbers (integers for the integer valued Numbers).
+    def _value_lists(self, values):
+        integer = [(num.exponent >= 0) and (type(num.constant) == int)
+                   for num in self.numbers]
+        return [[int(v) if i else v for (v, i) in zip(row, integer)]
+                for row in values.tolist()]
+
     # Given a string of bits that represents a state of this circuit,
     # decode that string into the corresponding numbers (resolving
-    # logical conflicts like broken and gates if appropriate).
+    # logical conflicts like broken and gates if appropriate, the
+    # repaired bits are written back into "bits").
     def decode(self, bits):
-        # Check to see if length of the bit sequence is valid.
-        if (len(bits) != len(self.bits)):
-            raise(IndexError(f"The provided bits have length {len(bits)}, but this circuit has {len(self.bits)} bits."))
-        # Compute the decoded values.
-        values = []
-        # Cycle through the numbers and get their values (in order).
-        for i in range(len(self.numbers)):
-            num = self.numbers[i]
-            num_len = len(num.bit_indices)
-            # Compute the value of the number (encode it back into decimal).
-            value = sum(bits[idx] * 2**(j+num.exponent) for j, idx
-                        in enumerate(num.bit_indices[:num_len-num.signed]))
-            if num.signed: value -= bits[num.bit_indices[-1]] * 2**(num_len-1+num.exponent)
-            value += num.constant
-            # Record the (name, value, and percentage of failed and gates).
-            values.append( value )
-        # Fix all of the failed and gates and track the number failed.
-        failed_and_gates = 0
-        for ag in self.and_gates:
-            # Get all involved terms in this AND gate.
-            inputs = set()
-            output = None
-            for coef in ag:
-                if coef[0] == "a": output = int(coef[1:])
-                else: inputs.update(map(int,coef[1:].split('b')))
-            inputs.remove(output)
-            # Convert the inputs into proper indices.
-            c1, c2 = [i-1 for i in inputs]
-            a = output - 1
-            # Check to see if the gate was violated.
-            if (int(bits[c1] and bits[c2]) != bits[a]):
-                failed_and_gates += 1
-                # Fix the gate if it was violated.
-                bits[a] = int(bits[c1] and bits[c2])
-        and_failures = (None if (len(self.and_gates) == 0) else 
-                        100 * failed_and_gates / len(self.and_gates))
+        problem = self._problem()
+        values, repaired, and_failures = self.decode_batch([bits], problem)
+        for a in problem.and_gates[:,2].tolist(): bits[a] = int(repaired[0,a])
+        if (and_failures is not None): and_failures = float(and_failures[0])
         # Return the (list of values, and the % of and-gates broken).
-        return values, and_failures
-                
+        return self._value_lists(values)[0], and_failures
+
     # Run this circuit as if executing on a quantum annealer. Most
     # importantly, turn the binary representations back into
     # interpretable results and resolve any logical inconsistencies.
@@ -271,34 +535,112 @@ class Circuit:
     # If you are using a custom System, then the keywork arguments for
     # the "System.samples" function could also be passed in here.
     # 
+    # "and_strength" is the margin of every AND gate penalty, in units
+    # of the largest Ising weight of the squared equations. Each gate
+    # is first given the most energy that breaking it could save, so
+    # the lowest energy states never break a gate for any margin, and
+    # a larger margin makes gates break less often on noisy hardware.
+    # (This is added to that bound, it no longer multiplies the largest
+    # Ising weight to get one strength for all gates.)
+    # 
     def run(self, and_strength=1/2, min_only=True, display=True, **run_qubo_kwargs):
+        import inspect
+        user_locals = inspect.currentframe().f_back.f_locals
+        prepared = self._prepare(and_strength, display, run_qubo_kwargs)
+        return self._finish(prepared, min_only, display, user_locals)
+
+    # Start running this circuit in the background, returning a Future
+    # for the solutions that "run" would return. Circuits started this
+    # way share one Pipeline, so the compilation (and embedding) of one
+    # circuit overlaps with the sampling of the circuits before it.
+    # Outputs are not displayed by default, since runs are concurrent.
+    def run_async(self, and_strength=1/2, min_only=True, display=False, **run_qubo_kwargs):
+        import inspect
+        user_locals = inspect.currentframe().f_back.f_locals
+        return default_pipeline().submit(self, and_strength, min_only, display,
+                                         _user_locals=user_locals, **run_qubo_kwargs)
+
+    # The first stage of "run", compile the circuit and do any work the
+    # system can do ahead of sampling (like embedding). Returns the
+    # compiled Problem, the keyword arguments for "run_qubo", and the
+    # requested rounding of energies.
+    def _prepare(self, and_strength, display, run_qubo_kwargs):
+        from qaml.systems import ExhaustiveSearch
+        # Compile once, every stage (including the system) reuses it.
+        problem = self.compile(and_strength=and_strength, verbose=display)
+        if display: print("\n"+str(problem.qubo)+"\n")
+        # Keep the exact sampled energies (rounding is applied at the end).
+        kwargs = dict(run_qubo_kwargs)
+        rounded = kwargs.pop("rounded", None)
+        # Separate the arguments of "run_qubo" from those of the system.
+        qubo_kwargs = {k:kwargs.pop(k) for k in ("num_samples", "system", "top_k",
+                                                 "cache", "fresh") if (k in kwargs)}
+        system = qubo_kwargs.get("system", ExhaustiveSearch)
+        system = system(problem, constant=problem.constant)
+        # Systems only need a "samples" method, "prepare" is optional.
+        prepare = getattr(system, "prepare", None)
+        # Skip preparing when the samples will come from the cache.
+        if (prepare is not None) and self._cached(system, qubo_kwargs, kwargs):
+            prepare = None
+        if (prepare is not None): kwargs = prepare(**kwargs)
+        return problem, dict(qubo_kwargs, **kwargs), rounded
+
+    # Return True if "run_qubo" with these arguments would reuse cached
+    # samples of the (constructed) "system" instead of sampling it.
+    def _cached(self, system, qubo_kwargs, sample_kwargs):
+        from qaml.cache import default_result_cache
+        cache = qubo_kwargs.get("cache")
+        if (cache is None) or (cache is False) or qubo_kwargs.get("fresh", False) or \
+           (not hasattr(system, "cache_key")):
+            return False
+        if (cache is True): cache = default_result_cache()
+        num_samples = qubo_kwargs.get("num_samples")
+        if (num_samples is None): num_samples = min(2 ** system.num_bits, 1000)
+        return system.cache_key(num_samples, **sample_kwargs) in cache
+
+    # The second stage of "run", sample the prepared Problem and decode,
+    # display, and return the solutions.
+    def _finish(self, prepared, min_only, display, user_locals):
+        import numpy as np
         from qaml import run_qubo
         from qaml.systems import System
-        qubo = self.assemble(and_strength=and_strength, verbose=display)
-        system = System(qubo, constant=qubo.get('c',0))
-        if display: print("\n"+str(qubo)+"\n")
-        results = run_qubo(qubo, min_only=False, display=False, **run_qubo_kwargs)
+        problem, run_qubo_kwargs, rounded = prepared
+        system = System(problem, constant=problem.constant)
+        results = run_qubo(problem, min_only=False, display=False,
+                           rounded=None, **run_qubo_kwargs)
+        if (results.energy_histogram is not None):
+            self.energy_histogram = results.energy_histogram
+        if (results.metrics is not None): self.metrics = results.metrics
+        rows = results.rows
         # Get the total number of samples that were drawn from the system.
-        total_samples = sum(r[-1] for r in results.info.values())
-        # Capture all the outputs for each number.
-        outputs = {}
+        total_samples = sum(occurrence for (_, _, _, occurrence) in rows)
+        # Implicitly correct and gates, count failures, get numeric values.
+        values, repaired, and_failures = self.decode_batch(results, problem)
+        values = self._value_lists(values)
+        # Recompute the energy only for the states that were repaired.
+        energies = np.array([energy for (energy, _, _, _) in rows], dtype=float)
+        changed = np.flatnonzero((repaired != np.array(results, dtype=np.uint8).reshape(
+            repaired.shape)).any(axis=1))
+        if (len(changed) > 0): energies[changed] = system.energies(repaired[changed])
+        energies = energies.tolist()
+        if rounded: energies = [abs(e) if (e == 0) else e for e in
+                                (round(e, rounded) for e in energies)]
+        # Collect the names of the extra information columns.
         info_names = []
-        for bits in results:
-            # Get the (energy, chain break fraction, occurrence)[1:] for the bit pattern.
-            bits_info = results.info[tuple(bits)][1:]
-            # Implicitly correct and gates, count failures, get numeric values.
-            values, and_fails = self.decode( bits )
-            if (type(and_fails) == type(None)): and_fails = tuple()
-            else:
-                and_fails = (and_fails,)
-                if ("and breaks" not in info_names): info_names += ["and breaks"]
-            if (len(bits_info) > 1) and ("chain breaks" not in info_names):
-                info_names += ["chain breaks"]
-            # Compute the energy of the (corrected) set of bits.
-            energy = system.energy(bits)
-            # Store the information about AND failure rates and info if available.
-            key = (energy,) + tuple(values)
-            outputs[key] = outputs.get(key, []) + [and_fails + bits_info[:-1]] * bits_info[-1]
+        if (and_failures is not None): info_names += ["and breaks"]
+        if results.chain_breaks:       info_names += ["chain breaks"]
+        # Accumulate the occurrence and the (occurrence weighted) sums
+        # of the information columns for each distinct output.
+        outputs = {}
+        for i, (_, _, cbf, occurrence) in enumerate(rows):
+            info = []
+            if (and_failures is not None): info.append( and_failures[i] )
+            if results.chain_breaks:       info.append( cbf )
+            key = (energies[i],) + tuple(values[i])
+            if (key not in outputs): outputs[key] = [0, [0] * len(info)]
+            totals = outputs[key]
+            totals[0] += occurrence
+            for j, value in enumerate(info): totals[1][j] += value * occurrence
 
         # Reduce to only the minimum energy outputs if that was requested.
         # Notice this is done *after* correcting the AND gates.
@@ -308,18 +650,17 @@ class Circuit:
                 if (k[0] > min_energy): outputs.pop(k)
         solutions = []
         # Get the names of the Number objects (for tracking / displaying).
-        num_names = self._num_names()
+        num_names = self._num_names(user_locals)
         # Print out all of the outputs.
         printout = [num_names + info_names + ["Occurrence", "Energy"]]
         for key in sorted(outputs):
             energy, values = key[0], key[1:]
             solutions.append(values)
-            # Convert info into percentages.
-            info = [sum(row[i] for row in outputs[key]) / len(outputs[key])
-                    for i in range(len(info_names))]
-            info = [f"{val: 5.1f}%" for val in info]
+            # Convert info into (average) percentages.
+            occurrence, sums = outputs[key]
+            info = [f"{val / occurrence: 5.1f}%" for val in sums]
             printout += [ list(map(str, values)) + info +
-                          [str(len(outputs[key]))] + [str(energy)] ]
+                          [str(occurrence)] + [str(energy)] ]
         # If "display", then convert the printout into a table.
         if display:
             print(f"System collected {total_samples} samples.\n")
@@ -342,3 +683,73 @@ class Circuit:
         # Return the list of values that achieved desired energy performance.
         return solutions
 
+
+# A two stage pipeline for running many circuits. Circuits are compiled
+# (and embedded, when the system supports it) one at a time in the
+# order they are submitted, while up to "max_workers" of the circuits
+# before them are sampled and decoded on other threads.
+class Pipeline:
+    def __init__(self, max_workers=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self._prepare = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qaml-prepare")
+        self._finish = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="qaml-sample")
+
+    # Submit a circuit to be run (with the same arguments as
+    # "Circuit.run"), returning a Future for its solutions.
+    def submit(self, circuit, and_strength=1/2, min_only=True, display=False,
+               _user_locals=None, **run_qubo_kwargs):
+        if (_user_locals is None):
+            import inspect
+            _user_locals = inspect.currentframe().f_back.f_locals
+        prepared = self._prepare.submit(circuit._prepare, and_strength,
+                                        display, run_qubo_kwargs)
+        finish = lambda: circuit._finish(prepared.result(), min_only,
+                                         display, _user_locals)
+        return self._finish.submit(finish)
+
+    # Stop accepting circuits, "wait" for all submitted runs to finish.
+    def shutdown(self, wait=True):
+        self._prepare.shutdown(wait=wait)
+        self._finish.shutdown(wait=wait)
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.shutdown()
+
+_default_pipeline = None
+
+# Get the Pipeline shared by all calls to "Circuit.run_async".
+def default_pipeline():
+    global _default_pipeline
+    if (_default_pipeline is None): _default_pipeline = Pipeline()
+    return _default_pipeline
+
+# Run many circuits through a Pipeline, returning a list of Futures for
+# their solutions in the order the circuits were given. All keyword
+# arguments are passed to "Circuit.run" for every circuit.
+def run_many(circuits, max_workers=None, **run_kwargs):
+    import inspect
+    user_locals = inspect.currentframe().f_back.f_locals
+    pipeline = Pipeline(max_workers=max_workers)
+    futures = [pipeline.submit(c, _user_locals=user_locals, **run_kwargs)
+               for c in circuits]
+    # The submitted runs still complete, this only releases the threads.
+    pipeline.shutdown(wait=False)
+    return futures
+
+# Run many (small) circuits on the quantum annealer in as few hardware
+# jobs as possible, packing them into disjoint regions of the chip (see
+# "qaml.systems.sample_packed", which receives the remaining keyword
+# arguments). Returns the list of solutions that "Circuit.run" would
+# return for each circuit, in order.
+def run_packed(circuits, and_strength=1/2, min_only=True, display=False,
+               num_samples=20, rounded=None, **packing_kwargs):
+    import inspect
+    from qaml.systems import Recorded, sample_packed
+    user_locals = inspect.currentframe().f_back.f_locals
+    problems = [c.compile(and_strength=and_strength, verbose=display) for c in circuits]
+    sample_sets = sample_packed(problems, num_samples=num_samples, **packing_kwargs)
+    return [c._finish((problem, dict(system=Recorded, recorded=samples,
+                                     num_samples=num_samples), rounded),
+                      min_only, display, user_locals)
+            for (c, problem, samples) in zip(circuits, problems, sample_sets)]
+
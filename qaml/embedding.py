@@ -0,0 +1,186 @@
+import os
+from qaml.cache import DiskCache, content_hash
+
+# The location and size of the default on-disk embedding cache.
+default_cache_directory = os.path.join("~", ".qaml", "embeddings")
+default_cache_entries = 256
+_default_cache = None
+
+# The most seconds that any one embedding attempt may take (the
+# default of minorminer), and the seconds past a search budget that
+# attempts are given to return their embeddings before they are stopped.
+default_attempt_timeout = 1000
+attempt_grace = 1
+
+# Get the (shared) default embedding cache.
+def default_embedding_cache():
+    global _default_cache
+    if (_default_cache is None):
+        _default_cache = DiskCache(default_cache_directory,
+                                   max_entries=default_cache_entries)
+    return _default_cache
+
+# Get a canonical (sorted) list of edges from any iterable of pairs,
+# dropping self-loops (they do not change the graph to embed).
+def canonical_edges(edges):
+    return sorted({tuple(sorted(e)) for e in edges if (e[0] != e[1])})
+
+# Get the content address of a (hardware) graph given its edges.
+def graph_key(edges): return content_hash("target", canonical_edges(edges))
+
+# Get the content address of the problem of embedding the "source"
+# graph onto the "target" graph, where both are iterables of edges.
+# Isolated source nodes (given as self-loops) are part of the key. The
+# "target_key" can be provided to skip hashing a known target graph.
+def embedding_key(source, target, target_key=None):
+    source = list(source)
+    nodes = sorted({v for e in source for v in e})
+    if (target_key is None): target_key = graph_key(target)
+    return content_hash("embedding", nodes, canonical_edges(source), target_key)
+
+# Scores for embeddings (lower is better). Any function of an
+# embedding that returns a comparable value can be used instead.
+def max_chain_length(embedding): return max(map(len, embedding.values()))
+def total_qubits(embedding): return sum(map(len, embedding.values()))
+
+# Find one seeded embedding, giving up at the (time.time) "deadline"
+# or after "default_attempt_timeout" seconds. This lives at module
+# level so that it can be run in worker processes.
+def _embed(source, target, seed, deadline=None):
+    import time
+    from minorminer import find_embedding
+    timeout = default_attempt_timeout
+    if (deadline is not None): timeout = min(timeout, deadline - time.time())
+    if (timeout <= 0): return {}
+    return find_embedding(source, target, random_seed=seed, timeout=timeout)
+
+# Find an embedding of the "source" graph (an iterable of edges, like
+# the keys of a QUBO) onto the "target" graph (the edge list of the
+# hardware). Try "attempts" seeded embeddings (for repeatability) and
+# keep the one with the lowest "score" (the maximum chain length by
+# default, ties go to the lowest seed).
+#
+# Attempts run concurrently in a pool of "workers" processes (the
+# default is one per attempt, up to the number of CPUs, and 1 runs
+# them serially in this process). The search stops after "budget"
+# seconds of wall-clock time (keeping the best embedding found so far)
+# or as soon as an embedding scores at or below "target". Every attempt
+# ends by the budget (returning the best embedding it has), attempts
+# are collected for "attempt_grace" more seconds, and then any worker
+# still running is terminated.
+#
+# "cache" is either True (the default on-disk cache), a DiskCache, or
+# None / False to always search. A cached embedding is used when it
+# was found with at least as many attempts as requested, or when it
+# already meets the "target" score. "target_key" is the precomputed
+# content address of the target graph (see "SamplerSession").
+def find_best_embedding(source, target, attempts=5, cache=True, verbose=False,
+                        score=None, target_score=None, budget=None, workers=None,
+                        target_key=None):
+    import time
+    if (score is None):    score = max_chain_length
+    if (cache is True):    cache = default_embedding_cache()
+    elif (cache is False): cache = None
+    source = list(source)
+    target = list(target)
+    # Check for a previously discovered embedding.
+    if (cache is not None):
+        key = embedding_key(source, target, target_key)
+        key += "-" + getattr(score, "__name__", repr(score))
+        cached = cache.get(key)
+        if (cached is not None) and ((cached[0] >= attempts) or (
+                (target_score is not None) and (score(cached[1]) <= target_score))):
+            if verbose: print("Using cached embedding.")
+            return cached[1]
+    # Gather the embeddings that are found (in any order) as a
+    # sorted list of (score, seed, embedding).
+    start = time.time()
+    deadline = None if (budget is None) else start + budget
+    found = []
+    completed = 0
+    # Get the seconds left to collect attempts (None for no limit).
+    def remaining():
+        if (deadline is None): return None
+        return max(0, deadline + attempt_grace - time.time())
+    # Record a found embedding, return True if the search is done.
+    def record(seed, embedding):
+        if (len(embedding) > 0):
+            found.append( (score(embedding), seed, embedding) )
+            found.sort(key=lambda f: f[:2])
+        return (target_score is not None) and (len(found) > 0) and \
+            (found[0][0] <= target_score)
+    if (workers is None): workers = min(attempts, os.cpu_count() or 1)
+    if (workers <= 1):
+        for seed in range(attempts):
+            if (deadline is not None) and (time.time() >= deadline): break
+            completed += 1
+            if record(seed, _embed(source, target, seed, deadline)): break
+    else:
+        from multiprocessing import Pool
+        from queue import Queue, Empty
+        # Finished attempts (or their errors) arrive as (seed, result).
+        finished = Queue()
+        pool = Pool(workers)
+        try:
+            for seed in range(attempts):
+                put = lambda result, seed=seed: finished.put( (seed, result) )
+                pool.apply_async(_embed, (source, target, seed, deadline),
+                                 callback=put, error_callback=put)
+            while (completed < attempts):
+                try:          seed, embedding = finished.get(timeout=remaining())
+                except Empty: break
+                if isinstance(embedding, BaseException): raise(embedding)
+                completed += 1
+                if record(seed, embedding): break
+        finally:
+            # Stop any attempts that are still running.
+            pool.terminate()
+            pool.join()
+    if verbose and (completed < attempts):
+        print(f"Stopped embedding search after {completed} of {attempts} attempts "
+              f"({time.time()-start:.1f} seconds).")
+    # Verify that there were embeddings discovered.
+    if (len(found) == 0):
+        from qaml.exceptions import UnsolvableSystem
+        raise(UnsolvableSystem("No physical embeddings could be discovered for the provided QUBO."))
+    best_embedding = found[0][2]
+    # Store the embedding for future runs.
+    if (cache is not None): cache.put(key, (completed, best_embedding))
+    return best_embedding
+
+# Pack embeddings of many "sources" (iterables of edges) into disjoint
+# regions of the "target" graph, so that they can be sampled in one
+# job. Sources are placed greedily in order, each onto the target
+# nodes that the sources before it left unused, and a new group (job)
+# is started when a source does not fit. Returns a list of groups,
+# each a dictionary mapping source index to its embedding. Remaining
+# keyword arguments are passed to "find_best_embedding" (no cache is
+# used, since the free region of the target changes every time).
+def pack_embeddings(sources, target, attempts=1, verbose=False, **embedding_kwargs):
+    from qaml.exceptions import UnsolvableSystem
+    embedding_kwargs["cache"] = None
+    target = list(target)
+    groups = []
+    used = set()
+    for i, source in enumerate(sources):
+        source = list(source)
+        embedding = None
+        # Try to fit this source into the unused part of the current group.
+        if (len(groups) > 0):
+            free = [e for e in target if (e[0] not in used) and (e[1] not in used)]
+            try:
+                embedding = find_best_embedding(source, free, attempts=attempts,
+                                                **embedding_kwargs)
+            except UnsolvableSystem: pass
+        # Otherwise start a new group with the whole target graph.
+        if (embedding is None):
+            used = set()
+            groups.append( {} )
+            embedding = find_best_embedding(source, target, attempts=attempts,
+                                            **embedding_kwargs)
+        groups[-1][i] = embedding
+        used.update(q for chain in embedding.values() for q in chain)
+    if verbose:
+        print(f"Packed {len(sources)} problems into {len(groups)} jobs of sizes",
+              [len(g) for g in groups])
+    return groups
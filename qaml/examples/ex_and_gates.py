@@ -0,0 +1,35 @@
+from qaml import Circuit, SampleSet
+from qaml.systems import ExhaustiveSearch
+
+# Products of numbers are computed with AND gates. Check that every
+# lowest energy state of the assembled QUBO keeps all of its AND gates
+# (so a system sampling the QUBO directly finds correct answers).
+for (number, bits) in ((6, 2), (15, 3), (35, 3)):
+    c = Circuit()
+    a = c.Number(bits=bits)
+    b = c.Number(bits=bits)
+    c.add( a * b - number )
+    problem = c.compile(verbose=False)
+    # Enumerate every state of the QUBO.
+    system = ExhaustiveSearch(problem, constant=problem.constant)
+    states = SampleSet.collect(system.samples(2**problem.num_bits))
+    ground = states.filter(states.energies == states.energies.min())
+    values, _, and_failures = c.decode_batch(ground.bits)
+    assert (ground.energies == 0).all(), ground.energies
+    assert (and_failures == 0).all(), and_failures
+    print(f"a * b = {number:3d}", "ground states:",
+          sorted(map(tuple, values.astype(int).tolist())))
+
+
+#                         SAMPLE OUTPUT
+# ____________________________________________________________________
+#
+# a * b =   6 ground states: [(2, 3), (3, 2)]
+# a * b =  15 ground states: [(3, 5), (5, 3)]
+# a * b =  35 ground states: [(5, 7), (7, 5)]
+# ____________________________________________________________________
+#
+# COMMENTARY:
+#   The AND gate penalties are set from the magnitude of the terms
+#   that each ancillary bit replaced, so breaking a gate always costs
+#   more energy than it could save.
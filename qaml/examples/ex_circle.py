@@ -21,88 +21,89 @@ q = c.run(min_only=False)
 # ____________________________________________________________________
 # 
 #
-# Using and strength 0.05.
+# Using and strengths 0.24 to 0.43.
 #
-#  QUBO with 12 bits in range [-0.375, 0.328125].
-#    {'a12': -0.09375, 'b4b6': 0.1796875, 'b4b12': -0.08984375, 'b6b12': -0.03125, 'a11': 0.01953125, 'b4b5': 0.111328125, 'b4b11': -0.091796875, 'b5b11': -0.0859375, 'a10': -0.296875, 'b5b6': 0.328125, 'b5b10': -0.0625, 'b6b10': 0.03125, 'a9': -0.296875, 'b2b3': 0.328125, 'b2b9': -0.0625, 'b3b9': 0.03125, 'a8': -0.09375, 'b1b3': 0.1796875, 'b1b8': -0.08984375, 'b3b8': -0.03125, 'a7': 0.01953125, 'b1b2': 0.111328125, 'b1b7': -0.091796875, 'b2b7': -0.0859375, 'a1': -0.015380859375, 'a2': -0.05859375, 'a3': -0.1875, 'a4': -0.015380859375, 'a5': -0.05859375, 'a6': -0.1875, 'b1b4': -0.03076171875, 'b1b5': -0.060546875, 'b1b6': -0.1171875, 'b2b4': -0.060546875, 'b2b5': -0.1171875, 'b2b6': -0.21875, 'b3b4': -0.1171875, 'b3b5': -0.21875, 'b3b6': -0.375, 'c': 1, 'b1b9': 0.0078125, 'b1b10': 0.0078125, 'b1b11': 0.001953125, 'b1b12': 0.00390625, 'b2b8': 0.015625, 'b2b10': 0.03125, 'b2b11': 0.0078125, 'b2b12': 0.015625, 'b3b7': 0.03125, 'b3b10': 0.125, 'b3b11': 0.03125, 'b3b12': 0.0625, 'b4b7': 0.001953125, 'b4b8': 0.00390625, 'b4b9': 0.0078125, 'b4b10': 0.0078125, 'b5b7': 0.0078125, 'b5b8': 0.015625, 'b5b9': 0.03125, 'b5b12': 0.015625, 'b6b7': 0.03125, 'b6b8': 0.0625, 'b6b9': 0.125, 'b6b11': 0.03125, 'b7b8': 0.015625, 'b7b9': 0.03125, 'b7b10': 0.03125, 'b7b11': 0.0078125, 'b7b12': 0.015625, 'b8b9': 0.0625, 'b8b10': 0.0625, 'b8b11': 0.015625, 'b8b12': 0.03125, 'b9b10': 0.125, 'b9b11': 0.03125, 'b9b12': 0.0625, 'b10b11': 0.03125, 'b10b12': 0.0625, 'b11b12': 0.015625}
+#  QUBO with 12 bits in range [-0.859375, 1.2890625].
+#    {'a1': -0.015380859375, 'a2': -0.05859375, 'a3': -0.1875, 'a4': -0.015380859375, 'a5': -0.05859375, 'a6': -0.1875, 'b1b2': 0.259765625, 'b1b3': 0.203125, 'b2b3': 0.4296875, 'b4b5': 0.259765625, 'b4b6': 0.203125, 'b5b6': 0.4296875, 'b1b4': -0.03076171875, 'b1b5': -0.060546875, 'b1b6': -0.1171875, 'b2b4': -0.060546875, 'b2b5': -0.1171875, 'b2b6': -0.21875, 'b3b4': -0.1171875, 'b3b5': -0.21875, 'b3b6': -0.375, 'b4b7': 0.001953125, 'b6b7': 0.03125, 'b3b7': 0.1640625, 'b5b7': 0.0078125, 'b7b8': 0.0078125, 'b1b8': 0.001953125, 'b2b8': 0.0078125, 'b6b8': 0.1640625, 'b3b8': 0.03125, 'b8b9': 0.015625, 'b5b9': 0.015625, 'b4b9': 0.00390625, 'b6b9': 0.0625, 'b6b10': 0.125, 'b5b10': 0.03125, 'b8b10': 0.03125, 'b4b10': 0.0078125, 'b7b11': 0.015625, 'b10b11': 0.0625, 'b9b11': 0.03125, 'b1b11': 0.00390625, 'b2b11': 0.015625, 'b3b11': 0.0625, 'b10b12': 0.125, 'b7b12': 0.03125, 'b2b12': 0.03125, 'b3b12': 0.125, 'b9b12': 0.0625, 'b1b12': 0.0078125, 'a7': 0.919921875, 'b1b7': -0.61328125, 'b2b7': -0.61328125, 'a8': 0.919921875, 'b4b8': -0.61328125, 'b5b8': -0.61328125, 'a9': 0.71484375, 'b1b9': -0.4765625, 'b3b9': -0.4765625, 'a10': 1.2890625, 'b2b10': -0.859375, 'b3b10': -0.859375, 'a11': 0.71484375, 'b4b11': -0.4765625, 'b6b11': -0.4765625, 'a12': 1.2890625, 'b5b12': -0.859375, 'b6b12': -0.859375, 'c': 1}
 #  ------------------------------------------------------------------------------------
 #   -0.02
-#    0.11  -0.06
-#    0.18   0.33  -0.19
+#    0.26  -0.06
+#    0.20   0.43  -0.19
 #   -0.03  -0.06  -0.12  -0.02
-#   -0.06  -0.12  -0.22   0.11  -0.06
-#   -0.12  -0.22  -0.38   0.18   0.33  -0.19
-#   -0.09  -0.09   0.03   0.00   0.01   0.03   0.02
-#   -0.09   0.02  -0.03   0.00   0.02   0.06   0.02  -0.09
-#    0.01  -0.06   0.03   0.01   0.03   0.12   0.03   0.06  -0.30
-#    0.01   0.03   0.12   0.01  -0.06   0.03   0.03   0.06   0.12  -0.30
-#    0.00   0.01   0.03  -0.09  -0.09   0.03   0.01   0.02   0.03   0.03   0.02
-#    0.00   0.02   0.06  -0.09   0.02  -0.03   0.02   0.03   0.06   0.06   0.02  -0.09
+#   -0.06  -0.12  -0.22   0.26  -0.06
+#   -0.12  -0.22  -0.38   0.20   0.43  -0.19
+#   -0.61  -0.61   0.16   0.00   0.01   0.03   0.92
+#    0.00   0.01   0.03  -0.61  -0.61   0.16   0.01   0.92
+#   -0.48    0    -0.48   0.00   0.02   0.06    0     0.02   0.71
+#     0    -0.86  -0.86   0.01   0.03   0.12    0     0.03    0     1.29
+#    0.00   0.02   0.06  -0.48    0    -0.48   0.02    0     0.03   0.06   0.71
+#    0.01   0.03   0.12    0    -0.86  -0.86   0.03    0     0.06   0.12    0     1.29
 #  ------------------------------------------------------------------------------------
 #
-# a     	b     	and breaks	Energy         	
-#   0.75	  0.75	     50.0%	       0.015625	
-#  0.625	  0.75	     50.0%	 0.017822265625	
-#   0.75	 0.625	     50.0%	 0.017822265625	
-#  0.625	 0.625	     50.0%	   0.0478515625	
-#  0.625	 0.875	     50.0%	   0.0869140625	
-#  0.875	 0.625	     50.0%	   0.0869140625	
-#    0.5	  0.75	     50.0%	     0.09765625	
-#   0.75	   0.5	     50.0%	     0.09765625	
-#   0.75	 0.875	     50.0%	 0.123291015625	
-#  0.875	  0.75	     50.0%	 0.123291015625	
-#    0.5	 0.875	     50.0%	 0.140869140625	
-#  0.875	   0.5	     50.0%	 0.140869140625	
-#    0.5	 0.625	     50.0%	 0.144775390625	
-#  0.625	   0.5	     50.0%	 0.144775390625	
-#  0.375	  0.75	     50.0%	 0.228759765625	
-#   0.75	 0.375	     50.0%	 0.228759765625	
-#    0.5	   0.5	     50.0%	           0.25	
-#  0.375	 0.875	     50.0%	   0.2587890625	
-#  0.875	 0.375	     50.0%	   0.2587890625	
-#  0.375	 0.625	     50.0%	   0.2822265625	
-#  0.625	 0.375	     50.0%	   0.2822265625	
-#  0.875	 0.875	     50.0%	   0.2822265625	
-#  0.375	   0.5	     50.0%	 0.386962890625	
-#    0.5	 0.375	     50.0%	 0.386962890625	
-#   0.25	  0.75	     50.0%	       0.390625	
-#   0.75	  0.25	     50.0%	       0.390625	
-#   0.25	 0.875	     50.0%	 0.420166015625	
-#  0.875	  0.25	     50.0%	 0.420166015625	
-#   0.25	 0.625	     50.0%	 0.439697265625	
-#  0.625	  0.25	     50.0%	 0.439697265625	
-#  0.375	 0.375	     50.0%	   0.5166015625	
-#   0.25	   0.5	     50.0%	     0.53515625	
-#    0.5	  0.25	     50.0%	     0.53515625	
-#  0.125	  0.75	     50.0%	 0.568603515625	
-#   0.75	 0.125	     50.0%	 0.568603515625	
-#  0.125	 0.625	     50.0%	   0.6025390625	
-#  0.625	 0.125	     50.0%	   0.6025390625	
-#  0.125	 0.875	     50.0%	   0.6103515625	
-#  0.875	 0.125	     50.0%	   0.6103515625	
-#   0.25	 0.375	     50.0%	 0.650634765625	
-#  0.375	  0.25	     50.0%	 0.650634765625	
-#  0.125	   0.5	     50.0%	 0.679931640625	
-#    0.5	 0.125	     50.0%	 0.679931640625	
-#    0.0	  0.75	     50.0%	     0.75390625	
-#   0.75	   0.0	     50.0%	     0.75390625	
-#    0.0	 0.625	     50.0%	 0.761962890625	
-#  0.625	   0.0	     50.0%	 0.761962890625	
-#   0.25	  0.25	     50.0%	       0.765625	
-#  0.125	 0.375	     50.0%	   0.7744140625	
-#  0.375	 0.125	     50.0%	   0.7744140625	
-#    0.0	   0.5	     50.0%	         0.8125	
-#    0.5	   0.0	     50.0%	         0.8125	
-#    0.0	 0.875	     50.0%	 0.820556640625	
-#  0.875	   0.0	     50.0%	 0.820556640625	
-#  0.125	  0.25	     50.0%	 0.865478515625	
-#   0.25	 0.125	     50.0%	 0.865478515625	
-#    0.0	 0.375	     50.0%	 0.879150390625	
-#  0.375	   0.0	     50.0%	 0.879150390625	
-#  0.125	 0.125	     50.0%	   0.9384765625	
-#    0.0	  0.25	     50.0%	     0.94140625	
-#   0.25	   0.0	     50.0%	     0.94140625	
-#    0.0	 0.125	     50.0%	 0.984619140625	
-#  0.125	   0.0	     50.0%	 0.984619140625	
-#    0.0	   0.0	     50.0%	            1.0	
-
+# System collected 1000 samples.
+#
+# a     	b     	and breaks	Occurrence	Energy
+#   0.75	  0.75	     40.6%	        16	       0.015625
+#  0.625	  0.75	     51.3%	        13	 0.017822265625
+#   0.75	 0.625	     60.0%	        10	 0.017822265625
+#  0.625	 0.625	     43.9%	        19	   0.0478515625
+#  0.625	 0.875	     54.8%	        14	   0.0869140625
+#  0.875	 0.625	     51.3%	        25	   0.0869140625
+#    0.5	  0.75	     49.2%	        20	     0.09765625
+#   0.75	   0.5	     45.8%	        16	     0.09765625
+#   0.75	 0.875	     50.0%	        12	 0.123291015625
+#  0.875	  0.75	     47.5%	        20	 0.123291015625
+#    0.5	 0.875	     50.0%	        20	 0.140869140625
+#  0.875	   0.5	     50.0%	        12	 0.140869140625
+#    0.5	 0.625	     50.9%	        18	 0.144775390625
+#  0.625	   0.5	     54.5%	        11	 0.144775390625
+#  0.375	  0.75	     50.0%	        19	 0.228759765625
+#   0.75	 0.375	     43.1%	        12	 0.228759765625
+#    0.5	   0.5	     48.5%	        11	           0.25
+#  0.375	 0.875	     56.1%	        19	   0.2587890625
+#  0.875	 0.375	     50.9%	        19	   0.2587890625
+#  0.375	 0.625	     50.0%	        19	   0.2822265625
+#  0.625	 0.375	     43.3%	        15	   0.2822265625
+#  0.875	 0.875	     52.4%	        14	   0.2822265625
+#  0.375	   0.5	     45.4%	        18	 0.386962890625
+#    0.5	 0.375	     52.4%	        14	 0.386962890625
+#   0.25	  0.75	     57.1%	        14	       0.390625
+#   0.75	  0.25	     43.9%	        11	       0.390625
+#   0.25	 0.875	     56.4%	        13	 0.420166015625
+#  0.875	  0.25	     43.1%	        12	 0.420166015625
+#   0.25	 0.625	     57.8%	        17	 0.439697265625
+#  0.625	  0.25	     53.6%	        23	 0.439697265625
+#  0.375	 0.375	     55.6%	        12	   0.5166015625
+#   0.25	   0.5	     58.9%	        15	     0.53515625
+#    0.5	  0.25	     56.2%	        16	     0.53515625
+#  0.125	  0.75	     46.5%	        19	 0.568603515625
+#   0.75	 0.125	     51.7%	        10	 0.568603515625
+#  0.125	 0.625	     49.0%	        16	   0.6025390625
+#  0.625	 0.125	     48.1%	        18	   0.6025390625
+#  0.125	 0.875	     43.3%	        15	   0.6103515625
+#  0.875	 0.125	     51.3%	        13	   0.6103515625
+#   0.25	 0.375	     53.8%	        13	 0.650634765625
+#  0.375	  0.25	     45.2%	        14	 0.650634765625
+#  0.125	   0.5	     38.3%	        10	 0.679931640625
+#    0.5	 0.125	     51.9%	         9	 0.679931640625
+#    0.0	  0.75	     56.9%	        17	     0.75390625
+#   0.75	   0.0	     57.8%	        15	     0.75390625
+#    0.0	 0.625	     52.6%	        13	 0.761962890625
+#  0.625	   0.0	     51.0%	        17	 0.761962890625
+#   0.25	  0.25	     55.6%	        18	       0.765625
+#  0.125	 0.375	     51.6%	        21	   0.7744140625
+#  0.375	 0.125	     50.0%	         7	   0.7744140625
+#    0.0	   0.5	     48.2%	        19	         0.8125
+#    0.5	   0.0	     51.0%	        16	         0.8125
+#    0.0	 0.875	     47.1%	        17	 0.820556640625
+#  0.875	   0.0	     48.5%	        11	 0.820556640625
+#  0.125	  0.25	     54.6%	        18	 0.865478515625
+#   0.25	 0.125	     51.2%	        14	 0.865478515625
+#    0.0	 0.375	     45.8%	        16	 0.879150390625
+#  0.375	   0.0	     53.5%	        19	 0.879150390625
+#  0.125	 0.125	     40.0%	        10	   0.9384765625
+#    0.0	  0.25	     56.7%	        20	     0.94140625
+#   0.25	   0.0	     51.6%	        21	     0.94140625
+#    0.0	 0.125	     47.1%	        23	 0.984619140625
+#  0.125	   0.0	     58.3%	        14	 0.984619140625
+#    0.0	   0.0	     50.0%	        18	            1.0
@@ -0,0 +1,73 @@
+import os, shutil, tempfile, time
+from qaml import Circuit, QuantumAnnealer, SamplerSession, fake_sampler, run_packed
+from qaml.cache import DiskCache
+
+# Run the quantum annealer paths without a D-Wave account. The fake
+# sampler runs simulated annealing over a Chimera graph (the hardware
+# structure of a D-Wave 2000Q) and one session is shared by all runs,
+# so the sampler and its structure are only set up once.
+session = SamplerSession(fake_sampler())
+print(f"Sampling with {session} on {len(session.nodelist)} qubits.\n")
+
+# Keep the embeddings and the samples in (fresh) on-disk caches.
+directory = tempfile.mkdtemp()
+embeddings = DiskCache(os.path.join(directory, "embeddings"))
+results = DiskCache(os.path.join(directory, "results"))
+
+# Pin a signed 3-bit number to 1 (like "ex_pinning.py").
+c = Circuit()
+a = c.Number(bits=3, exponent=-1, signed=True)
+c.add( a - 1 )
+
+# The first run finds an embedding and samples, the second run reuses
+# the cached samples (without embedding), and the third run draws
+# fresh samples with the cached embedding.
+for (run, fresh) in enumerate((False, False, True)):
+    start = time.time()
+    solutions = c.run(system=QuantumAnnealer, session=session, num_samples=100,
+                      embedding_cache=embeddings, cache=results, fresh=fresh,
+                      display=False, verbose=False)
+    print(f"Run {run+1} found a = {solutions[0][0]} in {time.time()-start:.2f} seconds "
+          f"({len(embeddings)} cached embedding, {len(results)} cached result).")
+print()
+
+# Pin several numbers at once, packing the circuits into disjoint
+# regions of the chip so that they are all sampled in one job.
+values = [-2.0, -0.5, 0.5, 1.5]
+circuits = []
+for value in values:
+    c = Circuit()
+    a = c.Number(bits=3, exponent=-1, signed=True)
+    c.add( a - value )
+    circuits.append( c )
+packed = run_packed(circuits, session=session, num_samples=100, verbose=True)
+for (value, solutions) in zip(values, packed):
+    print(f"Pinned to {value:4.1f}, found a = {solutions[0][0]:4.1f}")
+
+# Remove the example caches.
+shutil.rmtree(directory)
+
+
+#                         SAMPLE OUTPUT
+# ____________________________________________________________________
+#
+# Sampling with SamplerSession(StructureComposite) on 2048 qubits.
+#
+# Run 1 found a = 1.0 in 1.17 seconds (1 cached embedding, 1 cached result).
+# Run 2 found a = 1.0 in 0.00 seconds (1 cached embedding, 1 cached result).
+# Run 3 found a = 1.0 in 0.69 seconds (1 cached embedding, 1 cached result).
+#
+# Packed 4 problems into 1 jobs of sizes [4]
+# Pinned to -2.0, found a = -2.0
+# Pinned to -0.5, found a = -0.5
+# Pinned to  0.5, found a =  0.5
+# Pinned to  1.5, found a =  1.5
+# ____________________________________________________________________
+#
+# COMMENTARY:
+#   The second run reads its samples from the result cache, so it
+#   neither embeds nor samples. The third run asks for fresh samples,
+#   which replace the cached ones, but it still skips the embedding
+#   search because the embedding cache has the graph of this QUBO.
+#   All four packed circuits fit on the chip together, so they are
+#   sampled with a single call to the (fake) sampler.
@@ -15,38 +15,40 @@ c.run(min_only=False)
 #                         SAMPLE OUTPUT
 # ____________________________________________________________________
 # 
-# Using and strength 2.75.
 #
-#  QUBO with 8 bits in range [-7.75, 4].
-#    {'a8': 3.5, 'b1b3': 2.75, 'b1b8': -5.5, 'b3b8': -5.5, 'a7': -7.75, 'b2b4': 2.75, 'b2b7': -5.5, 'b4b7': -5.5, 'a6': -0.75, 'b1b4': 2.75, 'b1b6': -5.5, 'b4b6': -5.5, 'a5': -0.75, 'b2b3': 2.75, 'b2b5': -5.5, 'b3b5': -5.5, 'b5b6': 2.0, 'b5b7': 4.0, 'b5b8': 1.0, 'b6b7': 4, 'b6b8': 1.0, 'b7b8': 2.0, 'c': 25, 'a3': 0.0, 'a4': 0, 'a1': 0, 'a2': 0}
-#  --------------------------------------------------------
-#     0  
-#     0      0  
-#    2.75   2.75   0.00
-#    2.75   2.75    0      0  
-#     0    -5.50  -5.50    0    -0.75
-#   -5.50    0      0    -5.50   2.00  -0.75
-#     0    -5.50    0    -5.50   4.00    4    -7.75
-#   -5.50    0    -5.50    0     1.00   1.00   2.00   3.50
-#  --------------------------------------------------------
+# Using and strengths 11.00 to 11.00.
+# Reused AND gates saved 2 qubits.
 #
-# a 	b   	and breaks	Energy	
-#  3	 1.5	     50.0%	  0.25	
-#  2	 1.5	     50.0%	   4.0	
-#  3	 1.0	     50.0%	   4.0	
-#  2	 1.0	     50.0%	   9.0	
-#  1	 1.5	     50.0%	 12.25	
-#  3	 0.5	     50.0%	 12.25	
-#  1	 1.0	     50.0%	  16.0	
-#  2	 0.5	     50.0%	  16.0	
-#  1	 0.5	     50.0%	 20.25	
-#  0	 0.0	     50.0%	  25.0	
-#  0	 0.5	     50.0%	  25.0	
-#  0	 1.0	     50.0%	  25.0	
-#  0	 1.5	     50.0%	  25.0	
-#  1	 0.0	     50.0%	  25.0	
-#  2	 0.0	     50.0%	  25.0	
-#  3	 0.0	     50.0%	  25.0	
+#  QUBO with 6 bits in range [-22.0, 33.0].
+#    {'a1': 0, 'a2': 0, 'a3': 0.0, 'a4': 0, 'b1b3': -4.75, 'b1b4': -9, 'b2b3': -9.0, 'b2b4': -16, 'b4b5': 4, 'b3b5': 1.0, 'b2b6': 4.0, 'b1b6': 1.0, 'b5b6': 4.0, 'a5': 33.0, 'b1b2': 11.0, 'b1b5': -22.0, 'b2b5': -22.0, 'a6': 33.0, 'b3b4': 11.0, 'b3b6': -22.0, 'b4b6': -22.0, 'c': 25}
+#  ------------------------------------------------
+#     0
+#    11.00    0
+#   -4.75   -9.00    0.00
+#     -9     -16     11.00    0
+#   -22.00  -22.00   1.00     4      33.00
+#    1.00    4.00   -22.00  -22.00   4.00    33.00
+#  ------------------------------------------------
+#
+# System collected 64 samples.
+#
+# a 	b   	and breaks	Occurrence	Energy
+#  3	 1.5	     50.0%	         4	  0.25
+#  2	 1.5	     50.0%	         4	   4.0
+#  3	 1.0	     50.0%	         4	   4.0
+#  2	 1.0	     50.0%	         4	   9.0
+#  1	 1.5	     50.0%	         4	 12.25
+#  3	 0.5	     50.0%	         4	 12.25
+#  1	 1.0	     50.0%	         4	  16.0
+#  2	 0.5	     50.0%	         4	  16.0
+#  1	 0.5	     50.0%	         4	 20.25
+#  0	 0.0	     50.0%	         4	  25.0
+#  0	 0.5	     50.0%	         4	  25.0
+#  0	 1.0	     50.0%	         4	  25.0
+#  0	 1.5	     50.0%	         4	  25.0
+#  1	 0.0	     50.0%	         4	  25.0
+#  2	 0.0	     50.0%	         4	  25.0
+#  3	 0.0	     50.0%	         4	  25.0
 # ____________________________________________________________________
 # 
 # COMMENTARY:
@@ -13,53 +13,55 @@ c.add( a * b - 5 )
 c.run(min_only=False, system=QuantumAnnealer,
       and_strength=1/2, chain_strength=1/2)
 # 
-#     ^^ "and_strength" controls the relative strength of AND
-#        gates in the circuit. If you see them break a lot in the
-#        output, then consider increasing this value.
+#     ^^ "and_strength" is the margin (in units of the largest Ising
+#        weight of the circuit) that every AND gate penalty gets above
+#        the most energy that breaking the gate could save. If you see
+#        gates break a lot in the output, consider increasing it.
 #    
 #                        ^^ The same goes for chain strength with breaks.
 
 
 #                 SAMPLE OUTPUT ON REAL HARDWARE
+#    (reproduced with "session=SamplerSession(fake_sampler())",
+#     simulated annealing over a Chimera graph, without an account)
 # __________________________________________________________________
 # 
-# Using and strength 2.75.
-# 
-#  QUBO with 8 bits in range [-7.75, 4].
-#    {'a8': 3.5, 'b1b3': 2.75, 'b1b8': -5.5, 'b3b8': -5.5, 'a7': -7.75, 'b2b4': 2.75, 'b2b7': -5.5, 'b4b7': -5.5, 'a6': -0.75, 'b1b4': 2.75, 'b1b6': -5.5, 'b4b6': -5.5, 'a5': -0.75, 'b2b3': 2.75, 'b2b5': -5.5, 'b3b5': -5.5, 'b5b6': 2.0, 'b5b7': 4.0, 'b5b8': 1.0, 'b6b7': 4, 'b6b8': 1.0, 'b7b8': 2.0, 'c': 25, 'a3': 0.0, 'a4': 0, 'a1': 0, 'a2': 0}
-#  --------------------------------------------------------
-#     0  
-#     0      0  
-#    2.75   2.75   0.00
-#    2.75   2.75    0      0  
-#     0    -5.50  -5.50    0    -0.75
-#   -5.50    0      0    -5.50   2.00  -0.75
-#     0    -5.50    0    -5.50   4.00    4    -7.75
-#   -5.50    0    -5.50    0     1.00   1.00   2.00   3.50
-#  --------------------------------------------------------
+#
+# Using and strengths 11.00 to 11.00.
+# Reused AND gates saved 2 qubits.
+#
+#  QUBO with 6 bits in range [-22.0, 33.0].
+#    {'a1': 0, 'a2': 0, 'a3': 0.0, 'a4': 0, 'b1b3': -4.75, 'b1b4': -9, 'b2b3': -9.0, 'b2b4': -16, 'b4b5': 4, 'b3b5': 1.0, 'b2b6': 4.0, 'b1b6': 1.0, 'b5b6': 4.0, 'a5': 33.0, 'b1b2': 11.0, 'b1b5': -22.0, 'b2b5': -22.0, 'a6': 33.0, 'b3b4': 11.0, 'b3b6': -22.0, 'b4b6': -22.0, 'c': 25}
+#  ------------------------------------------------
+#     0
+#    11.00    0
+#   -4.75   -9.00    0.00
+#     -9     -16     11.00    0
+#   -22.00  -22.00   1.00     4      33.00
+#    1.00    4.00   -22.00  -22.00   4.00    33.00
+#  ------------------------------------------------
 #
 #
 # Max chain length of 3
 # Chain length distribution:
-#  2 chain -- ##
-#  3 chain -- ######
-# 
-# Using embedding with 22 qubits:
-#  0 [1489, 1361, 1492]
-#  1 [1491, 1363, 1495]
-#  2 [1488, 1360]
-#  3 [1356, 1364, 1352]
-#  4 [1490, 1362, 1494]
-#  5 [1358, 1366, 1355]
-#  6 [1357, 1365, 1354]
-#  7 [1359, 1367]
-# 
-# Max Ising weight:      1.0
-# Min Ising weight:     -4.1
-# Using chain strength:  2.1
-# 
-# a 	b   	and breaks	chain breaks	Energy	
-#  3	 1.5	      0.1%	        0.0%	  0.25	
+#  2 chain -- ####
+#  3 chain -- ##
+#
+# Using embedding with 14 qubits:
+#  0 [1312, 1184]
+#  1 [1305, 1310, 1318]
+#  2 [1317, 1309]
+#  3 [1315, 1191, 1187]
+#  4 [1313, 1316]
+#  5 [1319, 1314]
+#
+# Ising rescale factor: 5.5
+# Using chain strength: 2.75
+#
+# System collected 64 samples.
+#
+# a 	b   	and breaks	chain breaks	Occurrence	Energy
+#  3	 1.5	     67.2%	       31.8%	        64	  0.25
 # __________________________________________________________________
 #
 # COMMENTARY:
@@ -6,12 +6,16 @@ print_to_file = not simulated
 run_kwargs = dict(and_strength=1/8, chain_strength=1)
 
 # Setup the "system" for evaluating the QUBOs.
-from qaml import QuantumAnnealer, ExhaustiveSearch, QBSolve
-if simulated: system = ExhaustiveSearch
+from qaml import QuantumAnnealer, CircuitSearch, QBSolve
+if simulated: system = CircuitSearch
 else:         system = QuantumAnnealer
 
-# Remove the "chain_strength" argument for simulated results.
-if simulated: run_kwargs.pop("chain_strength")
+# Remove the "chain_strength" argument for simulated results, and
+# enumerate (when all states are requested) with one process per CPU.
+if simulated:
+    import os
+    run_kwargs.pop("chain_strength")
+    run_kwargs["processes"] = os.cpu_count()
 
 import time
 if print_to_file:
@@ -1,5 +1,7 @@
 import os
-from qaml.systems import ExhaustiveSearch
+from numbers import Number, Integral
+from collections.abc import MutableMapping
+from qaml.systems import ExhaustiveSearch, SampleSet
 from qaml.exceptions import UsageError, AmbiguousTerm
 
 # A convenience wrapper for executing a QUBO on a quantum annealer.
@@ -8,7 +10,8 @@ from qaml.exceptions import UsageError, AmbiguousTerm
 # 
 #   qubo        -- Dictionary of coeficients in the form
 #                   { a# : value ... b#b# : value ... c : value },
-#                  where "#" are natural numbers and "c" is optional.
+#                  where "#" are natural numbers and "c" is optional,
+#                  or an already compiled "Problem".
 #   num_samples -- int, how many samples should be drawn. Default
 #                  value is 2**(number of bits in system).
 #   system      -- A callable object that is provided a full QUBO
@@ -18,6 +21,14 @@ from qaml.exceptions import UsageError, AmbiguousTerm
 #   min_only    -- True if only the states with minimum observed
 #                  energy should be reported. False to show all states.
 #   display     -- True if outputs should be printed to user as table.
+#   top_k       -- int, if provided then only the "top_k" lowest
+#                  energy distinct states are kept (bounding memory).
+#   cache       -- True to reuse the samples of an identical earlier
+#                  run (same coefficients, system, number of samples,
+#                  and system keyword arguments) stored on disk, or a
+#                  "qaml.cache.DiskCache" to store them in. Off by default.
+#   fresh       -- True to draw new samples even when cached samples
+#                  exist (they replace the cached samples).
 #   **system_kwargs -- The keyword arguments that should be passed
 #                      to the system "sample" method. The most notable
 #                      usage would be to pass "chain_strength=<float>"
@@ -29,120 +40,272 @@ from qaml.exceptions import UsageError, AmbiguousTerm
 # 
 #    A list of lists of observed states sorted by energy first, then
 #    bit pattern second. If "min_only" is True, then only the states
-#    that obtained the minimum energy are returned.
+#    that obtained the minimum energy are returned. When the system
+#    enumerated every state, the (counts, edges) of all state energies
+#    are in the "energy_histogram" attribute of the returned list, and
+#    any measurements of the search reported by the system are in its
+#    "metrics" attribute.
 # 
 def run_qubo(qubo, num_samples=None, system=ExhaustiveSearch,
-             min_only=True, display=True, rounded=5, **system_kwargs):
-    # Make sure the provided QUBO is stored in "QUBO" class form.
-    if (type(qubo) != QUBO): qubo = QUBO(qubo)
+             min_only=True, display=True, rounded=5, top_k=None,
+             cache=None, fresh=False, **system_kwargs):
+    # Compile the provided QUBO once, all stages share the Problem.
+    if (type(qubo) != Problem): qubo = Problem(qubo)
+    problem, qubo = qubo, qubo.qubo
     # Take samples by calling the simulator repeatedly, track results.
-    system = system(qubo, constant=qubo.get('c',0))
+    system = system(problem, constant=problem.constant)
     # If the number of samples is not provided, try enough for all combinations.
     if num_samples == None: num_samples = min(2 ** system.num_bits, 1000)
     if display: print(f"Running {num_samples} times with:\n{qubo}")
-    # Execute the samples on the system.
-    results = {}
-    for sample in system.samples(num_samples, **system_kwargs):
+    # Execute the samples on the system, aggregating them as they arrive.
+    aggregator = StateAggregator(system.num_bits, top_k=top_k, min_only=min_only)
+    energy_histogram = None
+    metrics = None
+    if (cache is None) or (cache is False):
+        samples = system.samples(num_samples, **system_kwargs)
+    else:
+        samples = [system.cached_samples(num_samples, cache=cache, fresh=fresh,
+                                         **system_kwargs)]
+    for sample in samples:
+        # Add whole blocks of samples at once when they are provided.
+        if (type(sample) == SampleSet):
+            aggregator.add_samples(sample, rounded=rounded)
+            if (sample.energy_histogram is not None):
+                energy_histogram = sample.energy_histogram
+            if (sample.metrics is not None): metrics = sample.metrics
+            continue
         # Get the bit pattern, pattern energy, and chain break fraction.
         bits, energy, cbf = sample
         if (type(cbf) != type(None)): cbf *= 100
         if rounded:       energy = round(energy, rounded)
         if (energy == 0): energy = abs(energy)
-        count = results.get((energy, bits, cbf), 0)
-        # Store the results.
-        results[(energy, bits, cbf)] = count + sample.occurrence
-    # If the user only wants to see minimum energy solutions, get rid of others.
-    if min_only:
-        min_energy = min(results, key=lambda k: k[0])[0]
-        for (e,b,c) in list(results):
-            if (e > min_energy): results.pop((e,b,c))
+        aggregator.add(bits, energy, cbf, sample.occurrence)
+    # Get the sorted (energy, bits, chain break fraction, occurrence) rows.
+    rows = aggregator.rows()
     # If all of the chain break fraction values are None, remove them.
-    chain_breaks = True
-    if all(c == None for (e,b,c) in results):
-        chain_breaks = False
-        results = {key[:-1]:results[key] for key in results}
+    chain_breaks = not all(c == None for (e,b,c,o) in rows)
     # If the user wants to display the outputs then print those.
     if display:
         cbf = "\tChain breaks" if chain_breaks else ""
         # Print out the results in a neat format, sorted by energy then bit pattern.
-        b_space = 3
-        for r in results: b_space = max(b_space,len(str(r[1])))
-        o_space = 2
-        for r in results: o_space = max(o_space, 1+len(str(results[r])))
-        e_space = 4
-        for r in results: e_space = max(e_space, 1+len(str(r[0])))
+        b_space, o_space, e_space = 3, 2, 4
+        for (energy, bits, _, occurrence) in rows:
+            b_space = max(b_space, len(str(bits)))
+            o_space = max(o_space, 1+len(str(occurrence)))
+            e_space = max(e_space, 1+len(str(energy)))
         print()
         print(f" {'Bits':<{b_space}s}\tOccurrence{cbf}\tEnergy")
-        for sample in sorted(results):
-            if (len(cbf) == 0):
-                energy, bits = sample
-                cbf_str = ""
-            else:
-                energy, bits, chain_breaks = sample
-                cbf_str = f"{chain_breaks: 6.1f}%\t\t"
-            occurrence = results[sample]
+        for (energy, bits, breaks, occurrence) in rows:
+            cbf_str = f"{breaks: 6.1f}%\t\t" if chain_breaks else ""
             print(f" {str(bits):<{b_space}s}\t{occurrence: {o_space}d}\t\t{cbf_str} {str(energy):>{e_space}s}")
         print()
-    # Define a results class that contains the info about each result.
-    class Results(list):
-        # Old {  (energy, bits, chain break fraction) : (occurrence)  }
-        info = {tuple(key[1]) : (key[0],) + key[2:] + (results[key],) for key in results}
-        # New {  (bits) : (energy, chain break fraction, occurrence)  }
     # Convert results to only be the sorted set of bits.
-    return Results(list(key[1]) for key in sorted(results))
+    return Results(rows, chain_breaks, energy_histogram, metrics)
 
-# Given some of the coefficients, generate dictionary with all
-# coeficients ready to be provided to a quantum annealer in the form
-# { (#, #) : value }, where "#" are nonnegative integers and "value"
-# are floating point numbers.
-def make_dwave_qubo(display=False, **coefs):
-    from itertools import combinations
-    # Convert shorthand interaction coefficients to full form.
-    for c in [c for c in coefs if c[0] == "b"]:
-        if c.count("b") == 1:
-            if len(c) == 3:
-                c1, c2 = map(int,c[1:])
-                coefs[f"b{min(c1,c2)}b{max(c1,c2)}"] = coefs.pop(c)
+# The list of (sorted) bit patterns returned by "run_qubo". The "info"
+# attribute maps each tuple of bits to its (energy, occurrence), or to
+# (energy, chain break percentage, occurrence) when there were chains.
+class Results(list):
+    def __init__(self, rows, chain_breaks=False, energy_histogram=None, metrics=None):
+        super().__init__(list(bits) for (_, bits, _, _) in rows)
+        self._rows = rows
+        self._chain_breaks = chain_breaks
+        self._energy_histogram = energy_histogram
+        self._metrics = metrics
+        self._info = None
+
+    # The (energy, bits, chain break fraction, occurrence) of each state.
+    @property
+    def rows(self): return self._rows
+
+    # True if any of the states had chain break information.
+    @property
+    def chain_breaks(self): return self._chain_breaks
+
+    # The (counts, edges) of the energies of all states when the system
+    # enumerated them (see "ExhaustiveSearch"), otherwise None.
+    @property
+    def energy_histogram(self): return self._energy_histogram
+
+    # The dictionary of search measurements reported by the system
+    # (see "ParallelTempering"), otherwise None.
+    @property
+    def metrics(self): return self._metrics
+
+    # Build the info dictionary the first time it is requested.
+    @property
+    def info(self):
+        if (self._info is None):
+            if self._chain_breaks:
+                self._info = {bits : (e, c, o) for (e, bits, c, o) in self._rows}
             else:
-                # Raise an exception for ambiguous usage.
-                raise(AmbiguousTerm(f"Interaction term '{c}' is unclear, for >1 digit numbers use 'b#b#' specification."))
-        else:
-            # Make sure that the b-coefficients are in increasing order.
-            c1, c2 = map(int,c.split('b')[1:])
-            coefs[f"b{min(c1,c2)}b{max(c1,c2)}"] = coefs.pop(c)
-    num_bits = get_num_bits(coefs)
+                self._info = {bits : (e, o) for (e, bits, _, o) in self._rows}
+        return self._info
+
+# A streaming aggregator of observed states, storing each distinct
+# (energy, bits, chain break fraction) once under packed-bit keys with
+# a running occurrence count. When "top_k" is given only the "top_k"
+# lowest energy distinct states are kept (in a max-heap), and when
+# "min_only" is True states above the lowest energy seen so far are
+# discarded as they arrive. Memory is bounded by the number of kept
+# states rather than the number of samples. A "top_k" of None keeps
+# all states, otherwise it must be at least 1.
+class StateAggregator:
+    def __init__(self, num_bits, top_k=None, min_only=False):
+        if (top_k is not None) and (top_k < 1):
+            raise(ValueError(f"top_k must be None (keep all states) or at least 1, received {top_k}."))
+        self.num_bits = num_bits
+        self.top_k = top_k
+        self.min_only = min_only
+        self.min_energy = float('inf')
+        self.total = 0
+        # { (energy, packed bits, chain break fraction) : occurrence }
+        self.counts = {}
+        # Max-heap of (-energy, insertion order, key) used for top-k eviction.
+        self.heap = []
+        self._inserted = 0
+
+    # Add an observed state "bits" with its "energy", chain break
+    # fraction "cbf" (or None), and number of occurrences.
+    def add(self, bits, energy, cbf=None, occurrence=1):
+        import numpy as np
+        self.total += occurrence
+        packed = np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
+        self._add_key(energy, packed, cbf, occurrence)
+
+    # Keep a state given its packed bits (the total is already counted).
+    def _add_key(self, energy, packed, cbf, occurrence):
+        import heapq
+        # Discard states above the minimum (and reset on a new minimum).
+        if self.min_only:
+            if (energy > self.min_energy): return
+            elif (energy < self.min_energy):
+                self.min_energy = energy
+                self.counts.clear()
+                self.heap.clear()
+        key = (energy, packed, cbf)
+        if (key in self.counts):
+            self.counts[key] += occurrence
+            return
+        # Keep only the "top_k" lowest energy states.
+        if (self.top_k is not None):
+            self._inserted += 1
+            if (len(self.counts) < self.top_k):
+                heapq.heappush(self.heap, (-energy, self._inserted, key))
+            elif (energy < -self.heap[0][0]):
+                _, _, removed = heapq.heappushpop(self.heap, (-energy, self._inserted, key))
+                self.counts.pop(removed)
+            else: return
+        self.counts[key] = occurrence
+
+    # Add all rows of a SampleSet, rounding energies to "rounded" digits
+    # and reporting chain break fractions as percentages (like
+    # "run_qubo"). Rows that cannot be kept are dropped before any
+    # per-row work is done.
+    def add_samples(self, samples, rounded=None):
+        import numpy as np
+        energies = samples.energies.tolist()
+        if rounded: energies = [round(e, rounded) for e in energies]
+        energies = np.array(energies, dtype=float) + 0.0
+        self.total += int(samples.occurrences.sum())
+        keep = np.ones(len(energies), dtype=bool)
+        if (self.min_only and len(energies) > 0):
+            keep &= energies <= min(self.min_energy, energies.min())
+        if ((self.top_k is not None) and (len(self.counts) >= self.top_k)):
+            keep &= energies <= -self.heap[0][0]
+        rows = np.flatnonzero(keep)
+        if (len(rows) == 0): return
+        packed = np.packbits(samples.bits[rows], axis=1)
+        if (samples.chain_break_fractions is None): cbfs = [None] * len(rows)
+        else: cbfs = [None if (c != c) else c for c in
+                      (samples.chain_break_fractions[rows] * 100).tolist()]
+        occurrences = samples.occurrences[rows].tolist()
+        for i, row in enumerate(rows.tolist()):
+            self._add_key(energies[row].item(), packed[i].tobytes(),
+                          cbfs[i], occurrences[i])
+
+    # Return a list of (energy, bits, chain break fraction, occurrence)
+    # for all kept states, sorted by energy, then bits, then chain breaks.
+    def rows(self):
+        import numpy as np
+        rows = []
+        for (energy, packed, cbf), occurrence in self.counts.items():
+            bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=self.num_bits)
+            rows.append( (energy, tuple(bits.tolist()), cbf, occurrence) )
+        rows.sort(key=lambda r: (r[0], r[1], -1 if (r[2] is None) else r[2]))
+        return rows
+
+# Given a QUBO (or some of the coefficients as keyword arguments),
+# generate dictionary with all coeficients ready to be provided to a
+# quantum annealer in the form { (#, #) : value }, where "#" are
+# nonnegative integers and "value" are floating point numbers. When
+# "sparse" is True the zero-valued couplings are omitted, so the size
+# of the output scales with the number of nonzero terms (every bit
+# still has a linear entry).
+def make_dwave_qubo(qubo=None, display=False, sparse=False, **coefs):
+    from itertools import combinations
+    # Convert the coefficients into the integer-indexed QUBO form.
+    if (qubo is None):        qubo = QUBO(coefs)
+    elif (type(qubo) != QUBO): qubo = QUBO(qubo)
+    coefs = qubo._coefs
+    num_bits = qubo.num_bits
     # Generate the linear coeficients.
     output_coefs = {}
     for b1 in range(num_bits):
-        output_coefs[(b1,b1)] = coefs.get(f"a{b1+1}",0)
-    # Generate the quadratic coefficients.
+        output_coefs[(b1,b1)] = coefs.get((b1,b1),0)
+    # Generate the (nonzero) quadratic coefficients.
+    if sparse:
+        for (b1,b2) in sorted(coefs):
+            if (b1 != b2) and (coefs[(b1,b2)] != 0):
+                output_coefs[(b1,b2)] = coefs[(b1,b2)]
+        return output_coefs
+    # Generate all of the quadratic coefficients.
     for (b1,b2) in combinations(range(num_bits),2):
-        output_coefs[(b1,b2)] = coefs.get(f"b{b1+1}b{b2+1}",0)
+        output_coefs[(b1,b2)] = coefs.get((b1,b2),0)
     # Return the full set of linear and quadratic coeficients.
     return output_coefs
 
+# Given a QUBO (or a D-Wave style dictionary), generate the adjacency
+# list form of its nonzero couplings, a list holding one dictionary
+# { neighbor : weight } for each bit.
+def make_adjacency(qubo):
+    if (type(qubo) == QUBO): qubo = make_dwave_qubo(qubo, sparse=True)
+    num_bits = max(map(max, qubo)) + 1 if (len(qubo) > 0) else 0
+    adjacency = [{} for _ in range(num_bits)]
+    for (b1,b2), value in qubo.items():
+        if (b1 == b2) or (value == 0): continue
+        adjacency[b1][b2] = adjacency[b1].get(b2,0) + value
+        adjacency[b2][b1] = adjacency[b2].get(b1,0) + value
+    return adjacency
+
 # Given a QUBO object, get the rescale factor that will be used to fit
 # the corresponding Ising model onto the physical hardware.  Assume
 # that hardware allows "h" in range [-2,2] and "J" in range [-1,1].
 def qubo_ising_rescale_factor(qubo):
-    # If appropriate, convert QUBO into D-Wave format.
-    if (type(qubo) == QUBO): qubo = make_dwave_qubo(**qubo)
+    # Reuse the rescale factor of an already compiled problem.
+    if (type(qubo) == Problem): return qubo.rescale_factor
+    # If appropriate, convert QUBO into (sparse) D-Wave format.
+    if (type(qubo) == QUBO): qubo = make_dwave_qubo(qubo, sparse=True)
     # Get the corresponding Ising model.
     h, J, _ = qubo_to_ising(qubo)
-    # Get the max positive weight, divide 'h' values by 2 because
-    # they are allowed a greater range on the hardware..
+    return ising_rescale_factor(h, J)
+
+# Given the "h" and "J" of an Ising model, get the max positive weight,
+# dividing 'h' values by 2 because they are allowed a greater range on
+# the hardware.
+def ising_rescale_factor(h, J):
     rescale_factor = -float('inf')
     for coef in h: rescale_factor = max(abs(h[coef])/2, rescale_factor)
     for coef in J: rescale_factor = max(abs(J[coef]),   rescale_factor)
     # If no weight was assigned, or it is 0, then reset to 1.
-    if (rescale_factor in {-float('inf'), 0}): max_weight = 1
+    if (rescale_factor in {-float('inf'), 0}): rescale_factor = 1
     return rescale_factor
 
 # Given a QUBO dictionary { (i,j):weight ... }, convert it to an Ising
 # triple: ( { i:weight ... }, { (i,j):weight ... }, energy_offset )
 def qubo_to_ising(Q):
-    # If appropriate, convert QUBO into D-Wave format.
-    if (type(Q) == QUBO): Q = make_dwave_qubo(**Q)
+    # If appropriate, convert QUBO into (sparse) D-Wave format.
+    if (type(Q) == QUBO): Q = make_dwave_qubo(Q, sparse=True)
     # Create storage for outputs.
     h = {}
     J = {}
@@ -161,6 +324,54 @@ def qubo_to_ising(Q):
     offset += linear_offset / 2 + quadratic_offset / 4
     return h, J, offset
 
+# A compiled, immutable form of a QUBO that is shared by every stage
+# of a run, so that the string keys are parsed and the Ising form is
+# computed only once. Holds the sparse D-Wave style "coefficients",
+# the "linear" terms and nonzero couplings ("rows", "cols", "weights")
+# as read-only arrays, the Ising form ("h", "J", "offset") and its
+# "rescale_factor", and the AND gate table "and_gates", a read-only
+# (num_gates, 3) array of (input 1, input 2, output) bit indices.
+class Problem:
+    def __init__(self, qubo, and_gates=(), constant=None):
+        import numpy as np
+        from types import MappingProxyType
+        if (type(qubo) != QUBO): qubo = QUBO(qubo)
+        else:                    qubo = qubo.copy()
+        if (constant is None): constant = qubo.constant
+        assign = super().__setattr__
+        assign("qubo", qubo)
+        assign("constant", constant)
+        coefficients = make_dwave_qubo(qubo, sparse=True)
+        assign("coefficients", MappingProxyType(coefficients))
+        assign("num_bits", max(map(max, coefficients)) + 1 if (len(coefficients) > 0) else 0)
+        # Store the linear terms and the nonzero couplings as arrays.
+        linear = np.zeros(self.num_bits)
+        pairs = []
+        for (i1, i2), value in coefficients.items():
+            if (i1 == i2): linear[i1] = value
+            else:          pairs.append((i1, i2, value))
+        pairs = np.array(pairs, dtype=float).reshape(-1, 3)
+        gates = np.array([tuple(g) for g in and_gates], dtype=int).reshape(-1, 3)
+        arrays = dict(linear=linear, rows=pairs[:,0].astype(int),
+                      cols=pairs[:,1].astype(int), weights=pairs[:,2],
+                      and_gates=gates)
+        for name, array in arrays.items():
+            array.setflags(write=False)
+            assign(name, array)
+        # Store the Ising form and the hardware rescale factor.
+        h, J, offset = qubo_to_ising(coefficients)
+        assign("h", MappingProxyType(h))
+        assign("J", MappingProxyType(J))
+        assign("offset", offset)
+        assign("rescale_factor", ising_rescale_factor(h, J))
+
+    # Problems cannot be modified after they are compiled.
+    def __setattr__(self, name, value):
+        raise(UsageError(f"Problem objects are immutable, cannot set '{name}'."))
+
+    def __repr__(self):
+        return f"Problem({self.num_bits} bits, {len(self.weights)} couplings, {len(self.and_gates)} and gates)"
+
 # Given an integer, convert it into a binary bit representation.
 def number_to_bits(number, num_bits=None):
     # Compute the required number of bits if that is not provided.
@@ -176,6 +387,19 @@ def number_to_bits(number, num_bits=None):
         if bits[i]: number -= value
     return tuple(bits)
 
+# Given a sequence of integers, convert them into a (len(numbers),
+# num_bits) matrix of their binary representations (most significant
+# bit first), the vectorized form of "number_to_bits".
+def numbers_to_bits(numbers, num_bits):
+    import numpy as np
+    # Large numbers do not fit into machine integers, convert them one at a time.
+    if (num_bits > 63):
+        return np.array([number_to_bits(n, num_bits) for n in numbers],
+                        dtype=np.uint8).reshape(-1, num_bits)
+    numbers = np.asarray(numbers, dtype=np.uint64).reshape(-1, 1)
+    shifts = np.arange(num_bits-1, -1, -1, dtype=np.uint64)
+    return ((numbers >> shifts) & np.uint64(1)).astype(np.uint8)
+
 # Get the number of bits by looking at the assigned coefficients.
 def get_num_bits(coefs):
     num_bits = 0
@@ -198,139 +422,237 @@ def is_numeric(obj):
         return True
     except: return False
 
+# Convert a QUBO key into the integer form used for storage. Linear
+# terms (string "a#" or integer "i") map to the pair (i, i), interaction
+# terms (string "b#b#" or "b##", or pair "(i, j)") map to the sorted
+# pair (i, j) with i <= j, and the constant term "c" maps to "c". All
+# string keys are 1-indexed, all integer keys are 0-indexed.
+def key_to_index(key):
+    # Handle integer keys (the fast path used internally).
+    if isinstance(key, Integral):
+        key = int(key)
+        return (key, key)
+    # Handle tuple keys in 0-indexed integer form.
+    elif (type(key) == tuple):
+        if (len(key) != 2): raise(UsageError(f"Unexpected key '{key}'."))
+        i1, i2 = map(int, key)
+        return (i1, i2) if (i1 <= i2) else (i2, i1)
+    # Handle string keys in 1-indexed mathematical form.
+    elif (type(key) == str):
+        if (len(key) == 0): raise(UsageError("QUBO keys must be 'a', 'b', 'c', or 'p' type."))
+        # Handle standard 'a' terms.
+        if (key[0] == 'a'):
+            i = int(key[1:]) - 1
+            return (i, i)
+        # Handle interaction 'b' terms.
+        elif (key[0] == 'b'):
+            # Handle special usage (single digit pairwise b terms).
+            if (key.count('b') == 1):
+                if (len(key) != 3): raise(AmbiguousTerm(f"Interaction term '{key}' is unclear, for >1 digit numbers use 'b#b#' specification."))
+                i1, i2 = map(int, key[1:])
+            # Handle general interaction usage (pairwise b terms).
+            elif (key.count('b') == 2):
+                i1, i2 = map(int, key[1:].split('b'))
+            else: raise(UsageError(f"Provided term '{key}' has too many b's."))
+            i1, i2 = i1-1, i2-1
+            return (i1, i2) if (i1 <= i2) else (i2, i1)
+        # Handle a constant coefficient added to the whole system energy.
+        elif (key[0] == 'c'): return 'c'
+    raise(UsageError(f"Unexpected key '{key}'."))
+
+# Convert an integer index pair (i, j) back into its 1-indexed string name.
+def index_to_key(index):
+    i1, i2 = index
+    if (i1 == i2): return f"a{i1+1}"
+    else:          return f"b{i1+1}b{i2+1}"
+
 # --------------------------------------------------------------------
-# A class for holding QUBO objects that supports "addition".
-class QUBO(dict):
+# A class for holding QUBO objects that supports "addition". The
+# coefficients are stored sparsely by integer index pairs (i, j) with
+# i <= j, the string keys "a#", "b#b#", and "c" are a view over that.
+class QUBO(MutableMapping):
     def __init__(self, *args, **kwargs):
+        # Sparse storage { (i, j) : value } and the constant (if set).
+        self._coefs = {}
+        self._constant = None
         # Handle the creation of a QUBO from another dictionary.
         if len(args) > 0:
             other_dict, args = args[0], args[1:]
-            for k in other_dict: self[k] = other_dict[k]
+            if (type(other_dict) == QUBO):
+                self._coefs.update(other_dict._coefs)
+                self._constant = other_dict._constant
+            else:
+                for k in other_dict: self[k] = other_dict[k]
         # Copy in any keyword arguments.
         if len(kwargs) > 0:
             for k in kwargs: self[k] = kwargs[k]
-        return super().__init__(*args)
+
+    # The number of bits used by this QUBO (highest index plus one).
+    @property
+    def num_bits(self):
+        if (len(self._coefs) > 0): return 1 + max(i2 for (_,i2) in self._coefs)
+        elif (self._constant is not None): return 1
+        else: return 0
+
+    # The constant term added to the whole system energy.
+    @property
+    def constant(self):
+        return 0 if (self._constant is None) else self._constant
+
+    # Iterate over the ((i, j), value) pairs in 0-indexed integer form.
+    def index_items(self): return self._coefs.items()
+
+    # Get the sparse (rows, cols, values) arrays for all coefficients,
+    # sorted by index with rows <= cols. Linear terms have rows == cols.
+    def arrays(self):
+        import numpy as np
+        indices = sorted(self._coefs)
+        rows = np.array([i1 for (i1,_) in indices], dtype=int)
+        cols = np.array([i2 for (_,i2) in indices], dtype=int)
+        values = np.array([self._coefs[k] for k in indices], dtype=float)
+        return rows, cols, values
 
     # Verify that this QUBO equals another term-for-term.
     def __eq__(self, other):
-        for term in self:
-            if (other.get(term,0) != self.get(term,0)):
-                print(term, other.get(term,0), self.get(term,0))
-                return False
-        for term in other:
-            if (other.get(term,0) != self.get(term,0)):
-                print(term, other.get(term,0), self.get(term,0))
-                return False
+        if (type(other) != QUBO): other = QUBO(other)
+        for q1, q2 in ((self, other), (other, self)):
+            for term in q1._coefs:
+                if (q1._coefs[term] != q2._coefs.get(term,0)):
+                    print(index_to_key(term), other._coefs.get(term,0), self._coefs.get(term,0))
+                    return False
+        if (self.constant != other.constant):
+            print('c', other.constant, self.constant)
+            return False
         return True
 
     # Define a "contains" method that works with integers as well as strings.
     def __contains__(self, key):
-        if (type(key) == int):
-            return super().__contains__(f"a{key+1}")
-        elif (type(key) == tuple):
-            c1, c2 = min(key), max(key)
-            return super().__contains__(f"b{c1+1}b{c2+1}")
-        elif (type(key) == str):
-            return super().__contains__(key)
-        else:
+        if (type(key) not in {int, tuple, str}) and (not isinstance(key, Integral)):
             raise(TypeError(f"Unexpected key type {type(key)}, '{key}'."))
+        index = key_to_index(key)
+        if (index == 'c'): return (self._constant is not None)
+        return (index in self._coefs)
+
+    # Iterate over the string names of all terms in this QUBO.
+    def __iter__(self):
+        for index in self._coefs: yield index_to_key(index)
+        if (self._constant is not None): yield 'c'
+
+    # The number of terms (including the constant) in this QUBO.
+    def __len__(self):
+        return len(self._coefs) + int(self._constant is not None)
 
     # Define a copy operator that generates a new QUBO.
-    def copy(self): return QUBO(super().copy())
+    def copy(self): return QUBO(self)
 
     # Define a new add operator.
     def __add__(self, other):
+        if (type(other) != QUBO): other = QUBO(other)
         # Initialize a dictionary with all values from both.
         output = other.copy()
-        output.update(self)
+        coefs = output._coefs
         # Add the intersections of the two together.
-        for k in set(other).intersection(set(self)):
-            output[k] = output[k] + other[k]
+        for k, v in self._coefs.items():
+            if k in coefs: coefs[k] = v + coefs[k]
+            else:          coefs[k] = v
+        if (self._constant is not None):
+            if (output._constant is None): output._constant = self._constant
+            else: output._constant = self._constant + output._constant
         # Return the new QUBO.
         return output
 
     # "radd" is the same as the add operation.
-    def __radd__(*args, **kwargs): return self.__add__(*args, **kwargs)
+    def __radd__(self, *args, **kwargs): return self.__add__(*args, **kwargs)
 
-    # Define 'multiply' for ints and floats.
+    # Define an in-place add operator that only touches the terms of
+    # "other" (instead of copying all of the terms in this QUBO).
+    def __iadd__(self, other):
+        if (type(other) != QUBO): other = QUBO(other)
+        self._accumulate(other)
+        return self
+
+    # Add "weight" times all coefficients of "other" into this QUBO.
+    def _accumulate(self, other, weight=1):
+        coefs = self._coefs
+        for k, v in other._coefs.items():
+            if (weight != 1): v = v * weight
+            if k in coefs: coefs[k] = coefs[k] + v
+            else:          coefs[k] = v
+        if (other._constant is not None):
+            v = other._constant if (weight == 1) else other._constant * weight
+            if (self._constant is None): self._constant = v
+            else: self._constant = self._constant + v
+
+    # Sum many QUBOs at once (each multiplied by the matching value in
+    # "weights" when those are given), in time linear in the total
+    # number of terms.
+    @staticmethod
+    def sum(qubos, weights=None):
+        output = QUBO()
+        if (weights is None): pairs = ((q, 1) for q in qubos)
+        else:                 pairs = zip(qubos, weights)
+        for q, weight in pairs:
+            if (type(q) != QUBO): q = QUBO(q)
+            if (not isinstance(weight, Number)): raise(TypeError("QUBO only supports multiplication by numbers."))
+            output._accumulate(q, weight)
+        return output
+
+    # Define 'multiply' for numbers (including NumPy scalars).
     def __mul__(self, num):
-        if (type(num) not in {int, float}): raise(TypeError(f"QUBO only supports multiplication by {int} and {float}."))
-        else: return QUBO({c:self[c]*num for c in self})
+        if (not isinstance(num, Number)): raise(TypeError("QUBO only supports multiplication by numbers."))
+        output = QUBO()
+        output._coefs = {k:v*num for (k,v) in self._coefs.items()}
+        if (self._constant is not None): output._constant = self._constant * num
+        return output
     # Define right hand multiply to be the same.
     def __rmul__(self, num): return self * num
 
-    # Define 'divide' for ints and floats.
+    # Define 'divide' for numbers (including NumPy scalars).
     def __truediv__(self, num):
-        if (type(num) not in {int, float}): raise(TypeError(f"QUBO only supports division by {int} and {float}."))
-        else: return QUBO({c:self[c]/num for c in self})
+        if (not isinstance(num, Number)): raise(TypeError("QUBO only supports division by numbers."))
+        output = QUBO()
+        output._coefs = {k:v/num for (k,v) in self._coefs.items()}
+        if (self._constant is not None): output._constant = self._constant / num
+        return output
 
     # Retrieve an item from this QUBO.
-    def __getitem__(self, key, *args, **kwargs):
-        # Retrieve based on string access (in 1-indexed mathematical form).
-        if type(key) == str:
-            if (key[0] == 'b') and (key.count('b') == 1):
-                i1, i2 = map(int, key[1:])
-                i1, i2 = min(i1,i2), max(i1,i2)
-                key = f"b{i1}b{i2}"
-            elif (key.count('b') == 2):
-                i1, i2 = map(int, key[1:].split('b'))
-                i1, i2 = min(i1,i2), max(i1,i2)
-                key = f"b{i1}b{i2}"
-            return super().__getitem__(key, *args, **kwargs)
-        # Retrieve based on tuple access (in 0-indexed integer form).
-        elif type(key) == tuple:
-            if (key[0] == key[1]):
-                return super().__getitem__(f"a{key[0]+1}", *args, **kwargs)
-            else:
-                return super().__getitem__(f"b{key[0]+1}b{key[1]+1}", *args, **kwargs)
-        # Retreive based on a single integer.
-        elif type(key) == int:
-            return super().__getitem__(f"a{key+1}", *args, **kwargs)
+    def __getitem__(self, key):
+        index = key_to_index(key)
+        if (index == 'c'):
+            if (self._constant is None): raise(KeyError(key))
+            return self._constant
+        try:             return self._coefs[index]
+        except KeyError: raise(KeyError(key)) from None
 
     # Make sure that items are set correctly into this qubo.
-    def __setitem__(self, key, value, *args, **kwargs):
-        # Handle standard 'a' terms.
-        if (type(key) == int): return super().__setitem__(f"a{key+1}", value, *args, **kwargs)
-        # Check for string keys.
-        if (len(key) == 0): raise(UsageError("QUBO keys must be 'a', 'b', 'c', or 'p' type."))
-        if (not is_numeric(value)):
+    def __setitem__(self, key, value):
+        if (not isinstance(value, Number)):
             raise(UsageError(f"Expected a numeric value, received {type(value)} instead."))
-        # Handle standard 'a' terms.
-        if (key[0] == 'a'): return super().__setitem__(key, value, *args, **kwargs)
-        # Handle interaction 'b' terms.
-        if (key[0] == 'b'):
-            # Handle special usage (single digit pairwise b terms).
-            if (key.count('b') == 1):
-                if (len(key) != 3): raise(AmbiguousTerm(f"Interaction term '{key}' is unclear, for >1 digit numbers use 'b#b#' specification."))
-                i1, i2 = map(int, key[1:])
-                i1, i2 = min(i1,i2), max(i1,i2)
-                return super().__setitem__(f"b{i1}b{i2}", value, *args, **kwargs)
-            # Handle general interaction usage (pairwise b terms).
-            elif (key.count('b') == 2):
-                i1, i2 = map(int, key[1:].split('b'))
-                i1, i2 = min(i1,i2), max(i1,i2)
-                return super().__setitem__(f"b{i1}b{i2}", value, *args, **kwargs)
-            else: raise UsageError(f"Provided term '{key}' has too many b's.")
-        # Handle a constant coefficient added to the whole system energy.
-        elif (key[0] == 'c'): super().__setitem__(key, value, *args, **kwargs)
-        # Handle tuple-index accessing.
-        elif (len(key) == 2) and (type(key) == tuple) and all(type(v) == int for v in key):
-            if key[0] == key[1]:
-                return super().__setitem__(f"a{key[0]+1}", value, *args, **kwargs)
-            i1, i2 = min(key), max(key)
-            return super().__setitem__(f"b{i1+1}b{i2+1}", value, *args, **kwargs)
-        else: raise(UsageError(f"Unexpected key '{key}'."))
+        index = key_to_index(key)
+        if (index == 'c'): self._constant = value
+        else:              self._coefs[index] = value
+
+    # Remove an item from this QUBO.
+    def __delitem__(self, key):
+        index = key_to_index(key)
+        if (index == 'c'):
+            if (self._constant is None): raise(KeyError(key))
+            self._constant = None
+        else:
+            try:             del self._coefs[index]
+            except KeyError: raise(KeyError(key)) from None
+
+    # Show the string-keyed dictionary form of this QUBO.
+    def __repr__(self): return repr(dict(self.items()))
 
     # Make a pretty printout of this QUBO.
     def __str__(self, log=False):
         import math
-        key_to_bit = lambda k: (int(k[1:]) if k[0] == 'a' else
-                                max(map(int,k[1:].split('b'))) 
-                                if k[0] == 'b' else 1)
         if len(self) > 0:
-            bits = max(map(key_to_bit, self))
+            bits = self.num_bits
         else:
             return "This QUBO has no defined bits."
+        coefs = self._coefs
         # Keep track of the column widths.
         col_widths = [0] * bits
         rows = []
@@ -339,13 +661,13 @@ class QUBO(dict):
         for i in range(bits):
             row = []
             for j in range(0,i):
-                v = self.get(f'b{j+1}b{i+1}', 0)
+                v = coefs.get((j,i), 0)
                 min_val = min(v, min_val)
                 max_val = max(v, max_val)
                 if (v != 0) and log: v = int(round(math.log(abs(v),2))) * (-1 if v < 0 else 1)
                 if (type(v) == int): row.append( str(v) )
                 else:                row.append( f"{v: .2f}" )
-            v = self.get(f'a{i+1}', 0)
+            v = coefs.get((i,i), 0)
             min_val = min(v, min_val)
             max_val = max(v, max_val)
             if (v != 0) and log: v = int(round(math.log(v,2))) * (-1 if v < 0 else 1)
@@ -359,5 +681,5 @@ class QUBO(dict):
             rows[i] = "  " + "  ".join([f"{v:^{width}s}" for (v,width) in zip(rows[i], col_widths)])
 
         max_width = max(map(len, rows))
-        return f' QUBO with {bits} bits in range [{min_val}, {max_val}].\n   ' + super().__str__() + '\n ' + '-'*max_width + "\n" + "\n".join(rows) + '\n ' + '-'*max_width
+        return f' QUBO with {bits} bits in range [{min_val}, {max_val}].\n   ' + repr(self) + '\n ' + '-'*max_width + "\n" + "\n".join(rows) + '\n ' + '-'*max_width
 # --------------------------------------------------------------------
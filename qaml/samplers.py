@@ -0,0 +1,100 @@
+import threading
+
+# A long-lived connection to a structured sampler (a D-Wave solver by
+# default). The sampler (and its network connection) is created once
+# on first use, and the solver structure and adjacency are fetched
+# once and cached, so many "QuantumAnnealer" runs can share a session.
+# Any structured dimod sampler can be given instead (like a
+# "fake_sampler" for testing without an account).
+class SamplerSession:
+    def __init__(self, sampler=None, token=None, **sampler_kwargs):
+        self._sampler = sampler
+        self._owned = (sampler is None)
+        self._token = token
+        self._sampler_kwargs = sampler_kwargs
+        self._structure = None
+        self._target_key = None
+        self._lock = threading.RLock()
+
+    # The sampler, connecting to the solver on first access.
+    @property
+    def sampler(self):
+        with self._lock:
+            if (self._sampler is None):
+                token = self._token
+                if (token is None): from qaml.setup import token
+                from dwave.system.samplers import DWaveSampler
+                self._sampler = DWaveSampler(token=token, **self._sampler_kwargs)
+            return self._sampler
+
+    # The (nodelist, edgelist, adjacency) of the sampler, cached.
+    @property
+    def structure(self):
+        with self._lock:
+            if (self._structure is None):
+                self._structure = tuple(self.sampler.structure)
+            return self._structure
+
+    @property
+    def nodelist(self): return self.structure[0]
+    @property
+    def edgelist(self): return self.structure[1]
+    @property
+    def adjacency(self): return self.structure[2]
+
+    # The content address of the target graph (for embedding caches).
+    @property
+    def target_key(self):
+        with self._lock:
+            if (self._target_key is None):
+                from qaml.embedding import graph_key
+                self._target_key = graph_key(self.edgelist)
+            return self._target_key
+
+    # Close the connection held by the sampler (if this session created
+    # it), the next use of the session reconnects.
+    def close(self):
+        with self._lock:
+            sampler = self._sampler
+            if (sampler is None) or (not self._owned): return
+            client = getattr(sampler, "client", None)
+            if hasattr(client, "close"): client.close()
+            elif hasattr(sampler, "close"): sampler.close()
+            self._sampler = None
+            self._structure = None
+            self._target_key = None
+
+    def __enter__(self): return self
+    def __exit__(self, *args): self.close()
+
+    def __repr__(self):
+        name = "unconnected" if (self._sampler is None) else type(self._sampler).__name__
+        return f"SamplerSession({name})"
+
+_default_session = None
+
+# Get a SamplerSession for "session", which may be a session, a
+# structured sampler, or None for the shared default session.
+def as_session(session=None):
+    if (session is None): return default_session()
+    if (not isinstance(session, SamplerSession)): session = SamplerSession(session)
+    return session
+
+# Get the session shared by all "QuantumAnnealer" runs that are not
+# given one explicitly.
+def default_session():
+    global _default_session
+    if (_default_session is None):
+        _default_session = SamplerSession()
+    return _default_session
+
+# Construct a local structured sampler that mimics a quantum annealer
+# with the given hardware graph (a Chimera graph by default) by running
+# simulated annealing over the embedded problem.
+def fake_sampler(graph=None, sampler=None):
+    import dimod
+    if (graph is None):
+        import dwave_networkx as dnx
+        graph = dnx.chimera_graph(16)
+    if (sampler is None): sampler = dimod.SimulatedAnnealingSampler()
+    return dimod.StructureComposite(sampler, list(graph.nodes), list(graph.edges))
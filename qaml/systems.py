@@ -1,3 +1,5 @@
+from numbers import Integral
+
 # The return type for the "System.samples" method.
 class Sample(list):
     _bits = None
@@ -35,44 +37,968 @@ class Sample(list):
         yield self._energy
         yield self._chain_break_fraction
 
+# A columnar block of samples, the vectorized counterpart of "Sample".
+# Holds a (num_samples, num_bits) uint8 matrix of "bits" along with
+# arrays of "energies", "chain_break_fractions" (None when there are no
+# chains), and "occurrences". Systems may yield these from "samples"
+# instead of individual Sample objects. Iterating over a SampleSet
+# (or indexing it with an integer) produces Sample objects. Systems
+# that see every state (like an exhaustive enumeration) attach the
+# (counts, edges) of all state energies as "energy_histogram", and
+# systems that measure their own search attach a "metrics" dictionary.
+class SampleSet:
+    energy_histogram = None
+    metrics = None
+
+    def __init__(self, bits, energies, chain_break_fractions=None, occurrences=None):
+        import numpy as np
+        self.energies = np.asarray(energies, dtype=float).reshape(-1)
+        # Keep the column count of a matrix of bits (even with no rows).
+        self.bits = np.asarray(bits, dtype=np.uint8)
+        if (self.bits.ndim != 2):
+            columns = -1 if (self.bits.size > 0) else 0
+            self.bits = self.bits.reshape(len(self.energies), columns)
+        self.chain_break_fractions = None
+        if (chain_break_fractions is not None):
+            self.chain_break_fractions = np.asarray(chain_break_fractions, dtype=float).reshape(-1)
+        if (occurrences is None): self.occurrences = np.ones(len(self.energies), dtype=np.int64)
+        else:                     self.occurrences = np.asarray(occurrences, dtype=np.int64).reshape(-1)
+
+    # Construct a SampleSet from a bit-packed matrix (see "packed_bits").
+    @classmethod
+    def from_packed(cls, packed, num_bits, *args, **kwargs):
+        import numpy as np
+        bits = np.unpackbits(np.asarray(packed, dtype=np.uint8), axis=1, count=num_bits)
+        return cls(bits, *args, **kwargs)
+
+    # Collect an iterable of Sample and SampleSet objects into one SampleSet.
+    @classmethod
+    def collect(cls, samples):
+        import numpy as np
+        blocks = []
+        singles = []
+        for s in samples:
+            if (type(s) == cls): blocks.append(s)
+            else:                singles.append(s)
+        if (len(singles) > 0):
+            cbf = [s.chain_break_fraction for s in singles]
+            blocks.append( cls([s.bits for s in singles], [s.energy for s in singles],
+                               None if all(c is None for c in cbf) else
+                               [np.nan if (c is None) else c for c in cbf],
+                               [s.occurrence for s in singles]) )
+        if (len(blocks) == 0): return cls(np.zeros((0,0)), [])
+        if (len(blocks) == 1): return blocks[0]
+        histograms = [b.energy_histogram for b in blocks if (b.energy_histogram is not None)]
+        metrics = [b.metrics for b in blocks if (b.metrics is not None)]
+        cbf = None
+        if any(b.chain_break_fractions is not None for b in blocks):
+            cbf = np.concatenate([np.full(len(b), np.nan) if (b.chain_break_fractions is None)
+                                  else b.chain_break_fractions for b in blocks])
+        collected = cls(np.concatenate([b.bits for b in blocks]),
+                        np.concatenate([b.energies for b in blocks]), cbf,
+                        np.concatenate([b.occurrences for b in blocks]))
+        if (len(histograms) > 0): collected.energy_histogram = histograms[0]
+        if (len(metrics) > 0):    collected.metrics = metrics[0]
+        return collected
+
+    # The number of bits in each sample.
+    @property
+    def num_bits(self): return self.bits.shape[1]
+
+    # The number of (not necessarily distinct) rows in this set.
+    def __len__(self): return len(self.energies)
+
+    # Produce a Sample for an integer index, otherwise a SampleSet
+    # holding the rows selected by a slice, index array, or mask.
+    def __getitem__(self, index):
+        if isinstance(index, Integral):
+            output = Sample()
+            output.bits = self.bits[index].tolist()
+            output.energy = self.energies[index]
+            if (self.chain_break_fractions is not None):
+                output.chain_break_fraction = self.chain_break_fractions[index]
+            output.occurrence = self.occurrences[index]
+            return output
+        return SampleSet(self.bits[index], self.energies[index],
+                         None if (self.chain_break_fractions is None) else
+                         self.chain_break_fractions[index], self.occurrences[index])
+
+    # Iterate over the rows of this set as Sample objects.
+    def __iter__(self):
+        for i in range(len(self)): yield self[i]
+
+    # Get the rows where "mask" is True.
+    def filter(self, mask):
+        import numpy as np
+        return self[np.asarray(mask, dtype=bool)]
+
+    # Get the rows sorted by energy, then by bit pattern.
+    def sort(self):
+        import numpy as np
+        keys = tuple(self.bits[:,i] for i in reversed(range(self.num_bits)))
+        return self[np.lexsort(keys + (self.energies,))]
+
+    # Merge rows with identical bit patterns, summing the occurrences
+    # and averaging chain break fractions (weighted by occurrence).
+    def dedup(self):
+        import numpy as np
+        if (len(self) == 0): return self
+        _, index, inverse = np.unique(self.packed_bits(), axis=0,
+                                      return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        occurrences = np.bincount(inverse, weights=self.occurrences).astype(np.int64)
+        cbf = None
+        if (self.chain_break_fractions is not None):
+            cbf = np.bincount(inverse, weights=self.chain_break_fractions
+                              * self.occurrences) / occurrences
+        return SampleSet(self.bits[index], self.energies[index], cbf, occurrences)
+
+    # Get the bits packed eight to a byte along each row.
+    def packed_bits(self):
+        import numpy as np
+        return np.packbits(self.bits, axis=1)
+
 # Base class for producing samples from a quantum system.
 class System():
-    # Initialize this ExhaustiveSearch with the provided coefficients.
+    # Initialize this ExhaustiveSearch with the provided coefficients
+    # (a QUBO, a D-Wave style dictionary, or a compiled Problem).
     def __init__(self, coefficients, constant=0):
-        from qaml.qubo import make_dwave_qubo
-        self.coefficients = make_dwave_qubo(**coefficients)
-        self.num_bits = max(map(max, self.coefficients)) + 1
+        from qaml.qubo import Problem
+        # Compile the coefficients unless that was already done.
+        if (type(coefficients) != Problem):
+            coefficients = Problem(coefficients, constant=constant)
+        self.problem = coefficients
+        self.coefficients = self.problem.coefficients
+        self.num_bits = self.problem.num_bits
         self.constant = constant
+        # Share the linear terms (diagonal) and the nonzero interaction
+        # terms as (row, column, weight) arrays, so that memory scales
+        # with the number of nonzero coefficients.
+        self.linear = self.problem.linear
+        self.rows = self.problem.rows
+        self.cols = self.problem.cols
+        self.weights = self.problem.weights
+        self._quadratic = None
+        self._adjacency = None
+
+    # The strictly upper triangular matrix of interaction terms (dense,
+    # built on first use by the searches that need it).
+    @property
+    def quadratic(self):
+        import numpy as np
+        if (self._quadratic is None):
+            self._quadratic = np.zeros((self.num_bits, self.num_bits))
+            self._quadratic[self.rows, self.cols] = self.weights
+        return self._quadratic
+
+    # Get the sparse adjacency of the interaction terms, a list holding
+    # one (neighbor indices, weights) pair of arrays for each bit.
+    def adjacency(self):
+        import numpy as np
+        if (self._adjacency is None):
+            from qaml.qubo import make_adjacency
+            self._adjacency = []
+            for neighbors in make_adjacency(self.coefficients):
+                order = sorted(neighbors)
+                self._adjacency.append( (np.array(order, dtype=int),
+                                         np.array([neighbors[j] for j in order], dtype=float)) )
+            # Bits without any coefficients still get (empty) entries.
+            while (len(self._adjacency) < self.num_bits):
+                self._adjacency.append( (np.zeros(0, dtype=int), np.zeros(0)) )
+        return self._adjacency
+
+    # Given a (num_states, num_bits) matrix of bits, compute the local
+    # field of every bit in every state (the energy change of turning
+    # that bit on, given all the other bits).
+    def local_fields(self, bit_matrix):
+        import numpy as np
+        fields = np.tile(self.linear, (len(bit_matrix), 1))
+        for i, (neighbors, weights) in enumerate(self.adjacency()):
+            fields[:,neighbors] += np.outer(bit_matrix[:,i], weights)
+        return fields
+
+    # Get the default (hot, cold) inverse temperatures for this system.
+    # The hot end accepts the largest possible energy increase half of
+    # the time and the cold end accepts the smallest increase 1% of the
+    # time. Returns (1, 1) when all coefficients are zero.
+    def beta_range(self):
+        import numpy as np
+        weights = [np.abs(w) for (_,w) in self.adjacency()]
+        max_delta = max(abs(l) + w.sum() for (l,w) in zip(self.linear, weights))
+        magnitudes = np.abs(np.concatenate([self.linear] + weights))
+        magnitudes = magnitudes[magnitudes > 0]
+        if (len(magnitudes) == 0): return (1.0, 1.0)
+        return (np.log(2) / max_delta, np.log(100) / magnitudes.min())
 
     # Given a set of bits, compute the energy of that set of bits and return it.
     def energy(self, bits):
         if (len(bits) != self.num_bits):
             from qaml.exceptions import UsageError
             raise(UsageError(f"Expected {self.num_bits}, but received {len(bits)}."))
-        energy = 0.0
-        for (i1, i2) in self.coefficients:
-            if (bits[i1] and bits[i2]):
-                energy += self.coefficients[(i1,i2)]
-        return energy + self.constant
+        return float(self.energies([bits])[0])
 
-    # Generate samples from the system, yield bits and energy.
+    # Given a (num_samples, num_bits) matrix of bits, compute the
+    # energy of every row at once, x*diag + x^T Q x (+ constant).
+    def energies(self, bit_matrix, chunk_size=2**16):
+        import numpy as np
+        bit_matrix = np.asarray(bit_matrix)
+        if (bit_matrix.ndim != 2) or (bit_matrix.shape[1] != self.num_bits):
+            from qaml.exceptions import UsageError
+            raise(UsageError(f"Expected a (num_samples, {self.num_bits}) matrix of bits, but received shape {bit_matrix.shape}."))
+        energies = np.empty(bit_matrix.shape[0])
+        # Sparse problems only look at the nonzero couplings, dense
+        # problems are faster as a matrix product.
+        sparse = (len(self.weights) * 8 < self.num_bits**2)
+        # Evaluate in chunks to bound the size of temporary arrays.
+        for start in range(0, bit_matrix.shape[0], chunk_size):
+            x = bit_matrix[start:start+chunk_size]
+            if sparse:
+                pairs = x[:,self.rows] * x[:,self.cols]
+                energies[start:start+chunk_size] = (
+                    x @ self.linear + pairs @ self.weights)
+            else:
+                x = x.astype(float)
+                energies[start:start+chunk_size] = (
+                    x @ self.linear + np.einsum("ij,ij->i", x @ self.quadratic, x))
+        return energies + self.constant
+
+    # Do any (slow) work for sampling that can happen ahead of time,
+    # returning the keyword arguments to give to "samples".
+    def prepare(self, **sample_kwargs): return sample_kwargs
+
+    # Keyword arguments of "samples" that only change how samples are
+    # found or displayed (not what is sampled), left out of cache keys.
+    _uncached_arguments = ("verbose",)
+
+    # Get the content address of drawing "num_samples" samples from this
+    # system with the given keyword arguments.
+    def cache_key(self, num_samples, **sample_kwargs):
+        from qaml.cache import content_hash, canonical
+        for name in self._uncached_arguments: sample_kwargs.pop(name, None)
+        system = type(self)
+        return content_hash("samples", f"{system.__module__}.{system.__qualname__}",
+                            self.num_bits, self.constant, self.linear, self.rows,
+                            self.cols, self.weights, num_samples, canonical(sample_kwargs))
+
+    # Get the samples from this system collected into one SampleSet,
+    # reusing the samples stored in "cache" (True for the default
+    # on-disk cache, or a DiskCache) by an identical earlier call,
+    # unless "fresh" samples are requested.
+    def cached_samples(self, num_samples, cache=True, fresh=False, **sample_kwargs):
+        from qaml.cache import default_result_cache
+        if (cache is True): cache = default_result_cache()
+        key = self.cache_key(num_samples, **sample_kwargs)
+        samples = None if fresh else cache.get(key)
+        if (samples is None):
+            samples = SampleSet.collect(self.samples(num_samples, **sample_kwargs))
+            cache.put(key, samples)
+        return samples
+
+    # Generate samples from the system, yield Sample or SampleSet objects.
     def samples(self):
         from qaml.exceptions import UsageError
         raise(UsageError("The sample method has not been defined for this System."))
 
+# Enumerate every state of the QUBO defined by the "linear" terms,
+# the strictly upper triangular "quadratic" terms, and the "constant",
+# returning the (bits, energies) of the "count" lowest energy states
+# sorted by energy. The last "block_bits" bits are scored for all of
+# their settings in one vectorized pass, while the remaining bits are
+# walked in Gray-code order. Each Gray-code step flips one bit and
+# updates the energy in O(degree) from the maintained local fields.
+# If "histogram_edges" are given, the counts of all state energies in
+# those (uniformly spaced) bins are returned too, otherwise None is.
+def gray_code_search(linear, quadratic, constant=0, count=1, block_bits=16,
+                     histogram_edges=None):
+    import numpy as np
+    from qaml.qubo import numbers_to_bits
+    num_bits = len(linear)
+    inner = min(num_bits, block_bits)
+    outer = num_bits - inner
+    symmetric = quadratic + quadratic.T
+    # Score all settings of the inner block (independent of the outer bits).
+    block = numbers_to_bits(range(2**inner), inner).astype(float)
+    inner_energy = (block @ linear[outer:] + np.einsum(
+        "ij,ij->i", block @ quadratic[outer:,outer:], block))
+    coupling = symmetric[outer:,:outer]
+    # Local fields on the outer bits and on the inner block.
+    outer_field = linear[:outer].copy()
+    inner_field = np.zeros(inner)
+    outer_energy = 0.0
+    outer_bits = np.zeros(outer, dtype=np.uint8)
+    code = 0
+    # The best states seen so far, stored as (energy, outer code, inner index).
+    best_energies = np.zeros(0)
+    best_codes = np.zeros(0, dtype=np.int64)
+    best_indices = np.zeros(0, dtype=np.int64)
+    threshold = float('inf')
+    histogram = None
+    if (histogram_edges is not None):
+        num_bins = len(histogram_edges) - 1
+        histogram = np.zeros(num_bins, dtype=np.int64)
+        low = histogram_edges[0] - constant
+        width = (histogram_edges[-1] - histogram_edges[0]) / num_bins
+    for step in range(2**outer):
+        energies = inner_energy + block @ inner_field + outer_energy
+        if (histogram is not None):
+            bins = np.clip(((energies - low) / width).astype(np.int64), 0, num_bins-1)
+            histogram += np.bincount(bins, minlength=num_bins)
+        indices = np.nonzero(energies < threshold)[0]
+        if (len(indices) > 0):
+            best_energies = np.concatenate((best_energies, energies[indices]))
+            best_codes = np.concatenate((best_codes, np.full(len(indices), code, dtype=np.int64)))
+            best_indices = np.concatenate((best_indices, indices))
+            # Keep only the "count" lowest energies.
+            if (len(best_energies) > count):
+                keep = np.argpartition(best_energies, count-1)[:count]
+                best_energies = best_energies[keep]
+                best_codes = best_codes[keep]
+                best_indices = best_indices[keep]
+            if (len(best_energies) >= count): threshold = best_energies.max()
+        # Flip the outer bit given by the next Gray code, update the fields.
+        if (step+1 < 2**outer):
+            k = ((step+1) & -(step+1)).bit_length() - 1
+            d = 1 - 2*int(outer_bits[k])
+            outer_energy += d * outer_field[k]
+            outer_field += d * symmetric[:outer,k]
+            inner_field += d * coupling[:,k]
+            outer_bits[k] ^= 1
+            code ^= (1 << k)
+    # Reconstruct the full bit patterns of the best states.
+    bits = np.zeros((len(best_energies), num_bits), dtype=np.uint8)
+    bits[:,:outer] = (best_codes[:,None] >> np.arange(outer)) & 1
+    bits[:,outer:] = block[best_indices]
+    # Recompute the energies exactly (removing accumulated rounding).
+    x = bits.astype(float)
+    energies = x @ linear + np.einsum("ij,ij->i", x @ quadratic, x) + constant
+    order = np.argsort(energies, kind="stable")
+    return bits[order], energies[order], histogram
+
+# Run "gray_code_search" over the subspace where the first bits are
+# fixed to "prefix", return the full bit patterns for the best states.
+def search_subspace(prefix, linear, quadratic, constant, count, histogram_edges):
+    import numpy as np
+    fixed = len(prefix)
+    p = np.asarray(prefix, dtype=float)
+    # Absorb the fixed bits into the linear terms and the constant.
+    sub_linear = linear[fixed:] + p @ quadratic[:fixed,fixed:]
+    sub_constant = constant + p @ linear[:fixed] + p @ quadratic[:fixed,:fixed] @ p
+    bits, energies, histogram = gray_code_search(
+        sub_linear, quadratic[fixed:,fixed:], sub_constant,
+        count=min(count, 2**len(sub_linear)), histogram_edges=histogram_edges)
+    prefixes = np.tile(np.asarray(prefix, dtype=np.uint8), (len(bits), 1))
+    return np.concatenate((prefixes, bits), axis=1), energies, histogram
+
 # This is a simple brute force quantum annealer base class, designed
-# to be subclassed by more advanced techniques.
+# to be subclassed by more advanced techniques. When "exact" is True
+# (or enough samples are requested to cover every state) all states
+# are enumerated deterministically in Gray-code order and the
+# "num_samples" lowest energy states are produced, otherwise states
+# are drawn uniformly at random without replacement.
+# 
+# Enumeration runs in "processes" worker processes when that is
+# greater than 1, each worker searching the subspace with the first
+# "prefix_bits" bits fixed. An enumeration also counts the energies of
+# all states, the (counts, edges) are attached to the yielded SampleSet
+# as "energy_histogram" (and kept in "energy_histogram" of the system).
 class ExhaustiveSearch(System):
+    energy_histogram = None
+
     # Generate samples from the system, yield bits and energy.
-    def samples(self, num_samples=1000):
-        from qaml.qubo import number_to_bits
+    def samples(self, num_samples=1000, batch_size=2**14, exact=False,
+                processes=1, prefix_bits=None, histogram_bins=100):
+        # Enumerate all states when requested.
+        if exact or (num_samples >= 2**self.num_bits):
+            bit_matrix, energies = self._enumerate(
+                min(num_samples, 2**self.num_bits), processes,
+                prefix_bits, histogram_bins)
+            states = SampleSet(bit_matrix, energies)
+            states.energy_histogram = self.energy_histogram
+            yield states
+            return
+        # Otherwise score random states.
+        yield from self._random_samples(num_samples, self.num_bits, batch_size)
+
+    # Yield "num_samples" distinct patterns of "num_bits" bits drawn
+    # uniformly at random, scored in batches of "batch_size" with a
+    # single matrix pass. The "expand" function turns a matrix of
+    # patterns into full states (the patterns are the states by default).
+    def _random_samples(self, num_samples, num_bits, batch_size, expand=None):
+        from itertools import islice
+        from qaml.qubo import numbers_to_bits
         from qaml.rand import random_range
-        for number in random_range(2**self.num_bits, count=num_samples):
-            bits = number_to_bits(number, self.num_bits)
-            output = Sample()
-            output.bits = bits
-            output.energy = self.energy(bits)
-            yield output
+        numbers = random_range(2**num_bits, count=num_samples)
+        while True:
+            batch = list(islice(numbers, batch_size))
+            if (len(batch) == 0): break
+            bit_matrix = numbers_to_bits(batch, num_bits)
+            if (expand is not None): bit_matrix = expand(bit_matrix)
+            yield SampleSet(bit_matrix, self.energies(bit_matrix))
+
+    # Call "search(prefix, *args)" for every setting of the first
+    # "prefix_bits" of "num_bits" enumerated bits (by default enough to
+    # give each worker several subspaces), in "processes" worker
+    # processes when that is greater than 1. Return the list of results.
+    def _partitioned(self, search, num_bits, processes, prefix_bits, *args):
+        from math import ceil, log2
+        from qaml.qubo import numbers_to_bits
+        if (prefix_bits is None):
+            prefix_bits = 0 if (processes <= 1) else ceil(log2(4*processes))
+        prefix_bits = max(0, min(prefix_bits, num_bits-1))
+        prefixes = numbers_to_bits(range(2**prefix_bits), prefix_bits).tolist()
+        if (processes <= 1): return [search(p, *args) for p in prefixes]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(search, p, *args) for p in prefixes]
+            return [f.result() for f in futures]
+
+    # Enumerate all states, partitioned over subspaces with fixed
+    # prefix bits, and return the (bits, energies) of the "count"
+    # lowest energy states.
+    def _enumerate(self, count, processes, prefix_bits, histogram_bins):
+        import numpy as np
+        # Bound the energies to place the histogram bins.
+        values = np.concatenate((self.linear, self.weights))
+        low = self.constant + values[values < 0].sum()
+        high = self.constant + values[values > 0].sum()
+        if (high <= low): high = low + 1
+        edges = np.linspace(low, high, histogram_bins+1)
+        results = self._partitioned(search_subspace, self.num_bits, processes, prefix_bits,
+                                    self.linear, self.quadratic, self.constant, count, edges)
+        # Merge the best states and the histograms from all subspaces.
+        bits = np.concatenate([r[0] for r in results])
+        energies = np.concatenate([r[1] for r in results])
+        self.energy_histogram = (sum(r[2] for r in results), edges)
+        order = np.argsort(energies, kind="stable")[:count]
+        return bits[order], energies[order]
+
+# Build the full states of a circuit from a matrix of the "free" bits
+# (the bits that are not AND gate outputs), deriving the outputs of the
+# AND "gates" (sorted so that ancillas of ancillas come last).
+def circuit_states(free_bits, free, gates, num_bits):
+    import numpy as np
+    bit_matrix = np.zeros((len(free_bits), num_bits), dtype=np.uint8)
+    bit_matrix[:,free] = free_bits
+    for (c1, c2, a) in gates:
+        bit_matrix[:,a] = bit_matrix[:,c1] & bit_matrix[:,c2]
+    return bit_matrix
+
+# Enumerate the free bits of a circuit with the first free bits fixed
+# to "prefix" (see "circuit_states"). Return the (bits, energies) of
+# the "count" lowest energy states of the subspace (in no order).
+def search_circuit_subspace(prefix, free, gates, num_bits, linear, rows, cols,
+                            weights, constant, count, batch_size=2**14):
+    import numpy as np
+    from qaml.qubo import numbers_to_bits
+    rest = len(free) - len(prefix)
+    best_bits = np.zeros((0, num_bits), dtype=np.uint8)
+    best_energies = np.zeros(0)
+    for start in range(0, 2**rest, batch_size):
+        batch = range(start, min(start + batch_size, 2**rest))
+        free_bits = numbers_to_bits(batch, rest)
+        prefixes = np.tile(np.asarray(prefix, dtype=np.uint8), (len(batch), 1))
+        bit_matrix = circuit_states(np.concatenate((prefixes, free_bits), axis=1),
+                                    free, gates, num_bits)
+        energies = (bit_matrix @ linear + (bit_matrix[:,rows] * bit_matrix[:,cols])
+                    @ weights + constant)
+        # Keep only the lowest energy states.
+        best_bits = np.concatenate((best_bits, bit_matrix))
+        best_energies = np.concatenate((best_energies, energies))
+        if (len(best_energies) > count):
+            keep = np.argpartition(best_energies, count-1)[:count]
+            best_bits, best_energies = best_bits[keep], best_energies[keep]
+    return best_bits, best_energies
+
+# An exhaustive search that is aware of the AND gates in a Circuit.
+# Every AND gate output (ancilla) is fully determined by its two
+# inputs, so only the remaining free bits are enumerated (or sampled)
+# and the ancillas are computed from them, shrinking the search space
+# from 2**(all bits) to 2**(free bits). The "and_gates" keyword is a
+# sequence of (input 1, input 2, output) bit indices, by default the
+# AND gates of the compiled Problem (as built by "Circuit.compile").
+# 
+# Like the ExhaustiveSearch, enumeration runs in "processes" worker
+# processes when that is greater than 1, each worker searching the
+# subspace with the first "prefix_bits" free bits fixed.
+class CircuitSearch(ExhaustiveSearch):
+    # Generate samples from the system, yield bits and energy.
+    def samples(self, num_samples=1000, and_gates=None, batch_size=2**14,
+                exact=False, processes=1, prefix_bits=None):
+        import numpy as np
+        # Default to the AND gates compiled into the problem.
+        if (and_gates is None): and_gates = self.problem.and_gates.tolist()
+        # Order the gates by output so ancillas of ancillas are computed last.
+        gates = sorted(map(tuple, and_gates), key=lambda g: g[2])
+        outputs = {a for (_,_,a) in gates}
+        free = [i for i in range(self.num_bits) if (i not in outputs)]
+        num_free = len(free)
+        # Enumerate all free bit patterns (partitioned over subspaces
+        # with fixed prefix bits), yielding the lowest energy states.
+        if exact or (num_samples >= 2**num_free):
+            count = min(num_samples, 2**num_free)
+            results = self._partitioned(
+                search_circuit_subspace, num_free, processes, prefix_bits,
+                free, gates, self.num_bits, self.linear, self.rows, self.cols,
+                self.weights, self.constant, count, batch_size)
+            states = SampleSet(np.concatenate([r[0] for r in results]),
+                               np.concatenate([r[1] for r in results])).sort()
+            yield states[:count]
+            return
+        # Otherwise draw a random subset of the free bit patterns.
+        expand = lambda free_bits: circuit_states(free_bits, free, gates, self.num_bits)
+        yield from self._random_samples(num_samples, num_free, batch_size, expand)
+
+# Perform one in-place Metropolis sweep over all bits of every state
+# (row) in "bits", maintaining the local "fields" (and the "energies"
+# if they are given). A flip is accepted when its energy change is
+# less than the corresponding value in "limits".
+def metropolis_sweep(bits, fields, adjacency, limits, energies=None):
+    import numpy as np
+    for i, (neighbors, weights) in enumerate(adjacency):
+        signs = 1 - 2*bits[:,i].astype(float)
+        deltas = signs * fields[:,i]
+        accept = deltas < limits[:,i]
+        bits[:,i] ^= accept
+        fields[:,neighbors] += np.outer(signs * accept, weights)
+        if (energies is not None): energies += deltas * accept
+
+# A classical simulated annealer, many independent replicas are
+# annealed at once with vectorized single-bit Metropolis updates. The
+# local field of every bit is maintained incrementally through the
+# sparse adjacency, so a sweep costs O(replicas * nonzeros). This
+# sampler provides the following keyword arguments:
+# 
+#    num_samples [100]    -- (integer) The number of independent
+#                            replicas, each produces one sample.
+#    sweeps [1000]        -- (integer) The number of sweeps over all
+#                            bits, each at the next inverse temperature.
+#    beta_range [None]    -- (float, float) The (hot, cold) inverse
+#                            temperatures, picked from the coefficient
+#                            magnitudes by default.
+#    beta_schedule ["geometric"] -- "geometric", "linear", or a
+#                            sequence of inverse temperatures (one per sweep).
+#    seed [None]          -- (integer) Seed for the random generator.
+# 
+class SimulatedAnnealing(System):
+    # Anneal all replicas and yield their final states.
+    def samples(self, num_samples=100, sweeps=1000, beta_range=None,
+                beta_schedule="geometric", seed=None):
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        betas = self.betas(sweeps, beta_range, beta_schedule)
+        adjacency = self.adjacency()
+        # Start every replica from a uniformly random state.
+        bits = rng.integers(0, 2, size=(num_samples, self.num_bits), dtype=np.uint8)
+        fields = self.local_fields(bits)
+        for beta in betas:
+            # A flip is accepted when delta < -log(u) / beta.
+            limits = -np.log(rng.random((num_samples, self.num_bits))) / beta
+            metropolis_sweep(bits, fields, adjacency, limits)
+        # Yield the final state of every replica.
+        yield SampleSet(bits, self.energies(bits))
+
+    # Construct the inverse temperature schedule, one beta per sweep.
+    def betas(self, sweeps, beta_range=None, beta_schedule="geometric"):
+        import numpy as np
+        if (type(beta_schedule) != str):
+            return np.asarray(beta_schedule, dtype=float)
+        if (beta_range is None): beta_range = self.beta_range()
+        hot, cold = beta_range
+        if (beta_schedule == "geometric"): return np.geomspace(hot, cold, sweeps)
+        elif (beta_schedule == "linear"):  return np.linspace(hot, cold, sweeps)
+        from qaml.exceptions import UsageError
+        raise(UsageError(f"Unrecognized beta schedule '{beta_schedule}', use 'geometric', 'linear', or a sequence of values."))
+
+# A parallel tempering (replica exchange) sampler. Several independent
+# ladders of replicas are run at once, each ladder holding one replica
+# per inverse temperature. Every sweep updates all replicas with
+# vectorized Metropolis steps, then neighboring temperatures in each
+# ladder propose to swap states. During the first half of the sweeps
+# the ladder adapts, widening gaps between temperatures that swap
+# often and narrowing gaps that rarely swap. This sampler provides the
+# following keyword arguments:
+# 
+#    num_samples [10]      -- (integer) The number of independent
+#                             ladders, each produces its best state.
+#    num_temperatures [16] -- (integer) The number of temperatures.
+#    sweeps [1000]         -- (integer) The number of sweeps.
+#    beta_range [None]     -- (float, float) The (hot, cold) inverse
+#                             temperatures, see "System.beta_range".
+#    adapt [True]          -- (bool) True adapts the temperature ladder.
+#    adapt_interval [10]   -- (integer) Sweeps between ladder updates.
+#    target_energy [None]  -- (float) Stop once this energy is reached.
+#    seed [None]           -- (integer) Seed for the random generator.
+# 
+# The yielded SampleSet (and this system) has "metrics" holding the
+# final ladder "betas", the "swap_acceptance" rate of each neighboring
+# pair, the "best_energy", the "sweeps" and "time" (seconds) that were
+# used, and the "sweeps_to_target" and "time_to_target" (None if it
+# was not reached).
+class ParallelTempering(System):
+    metrics = None
+
+    # Run the ladders and yield the best state found by each.
+    def samples(self, num_samples=10, num_temperatures=16, sweeps=1000,
+                beta_range=None, adapt=True, adapt_interval=10,
+                target_energy=None, seed=None):
+        import numpy as np
+        import time
+        start = time.time()
+        rng = np.random.default_rng(seed)
+        adjacency = self.adjacency()
+        num_temperatures = max(2, num_temperatures)
+        if (beta_range is None): beta_range = self.beta_range()
+        betas = np.geomspace(*beta_range, num_temperatures)
+        # Every row is one replica, row (l * temperatures + t) is the
+        # replica at temperature "t" in ladder "l".
+        num_replicas = num_samples * num_temperatures
+        bits = rng.integers(0, 2, size=(num_replicas, self.num_bits), dtype=np.uint8)
+        fields = self.local_fields(bits)
+        energies = self.energies(bits)
+        # Track the best state of each ladder.
+        best_energies = energies.reshape(num_samples, num_temperatures).min(axis=1)
+        best_rows = energies.reshape(num_samples, num_temperatures).argmin(axis=1)
+        ladder_starts = np.arange(num_samples) * num_temperatures
+        best_bits = bits[ladder_starts + best_rows].copy()
+        # Track the swap statistics for each neighboring pair of temperatures.
+        attempts = np.zeros(num_temperatures-1)
+        accepted = np.zeros(num_temperatures-1)
+        metrics = dict(sweeps_to_target=None, time_to_target=None)
+        # Count no completed sweeps when "sweeps" is 0.
+        sweep = -1
+        for sweep in range(sweeps):
+            row_betas = np.tile(betas, num_samples)
+            limits = -np.log(rng.random((num_replicas, self.num_bits))) / row_betas[:,None]
+            metropolis_sweep(bits, fields, adjacency, limits, energies)
+            # Propose swaps between alternating neighboring pairs.
+            pairs = np.arange(sweep % 2, num_temperatures-1, 2)
+            low = (ladder_starts[:,None] + pairs[None,:])
+            high = low + 1
+            log_ratio = (betas[pairs] - betas[pairs+1]) * (energies[low] - energies[high])
+            accept = np.log(rng.random(low.shape)) < log_ratio
+            attempts[pairs] += num_samples
+            accepted[pairs] += accept.sum(axis=0)
+            rows = np.concatenate((low[accept], high[accept]))
+            swapped = np.concatenate((high[accept], low[accept]))
+            bits[rows] = bits[swapped]
+            fields[rows] = fields[swapped]
+            energies[rows] = energies[swapped]
+            # Update the best state seen by each ladder.
+            ladder_energies = energies.reshape(num_samples, num_temperatures)
+            ladder_best = ladder_energies.argmin(axis=1)
+            ladder_min = ladder_energies[np.arange(num_samples), ladder_best]
+            improved = ladder_min < best_energies
+            best_energies[improved] = ladder_min[improved]
+            best_bits[improved] = bits[ladder_starts[improved] + ladder_best[improved]]
+            # Adapt the ladder from the swap acceptance rates.
+            if adapt and (sweep < sweeps // 2) and ((sweep+1) % adapt_interval == 0):
+                betas = self._adapt_ladder(betas, accepted / np.maximum(attempts, 1))
+                attempts[:] = 0
+                accepted[:] = 0
+            # Record the time to reach the target energy (and stop).
+            if (target_energy is not None) and (best_energies.min() <= target_energy):
+                metrics["sweeps_to_target"] = sweep + 1
+                metrics["time_to_target"] = time.time() - start
+                break
+        # Recompute the energies exactly (removing accumulated rounding).
+        final_energies = self.energies(best_bits)
+        metrics.update(
+            betas=betas, swap_acceptance=accepted / np.maximum(attempts, 1),
+            best_energy=float(final_energies.min()), sweeps=sweep + 1,
+            time=time.time() - start)
+        self.metrics = metrics
+        states = SampleSet(best_bits, final_energies)
+        states.metrics = metrics
+        yield states
+
+    # Given the inverse temperatures and the swap acceptance rate of
+    # each neighboring pair, move the intermediate temperatures so that
+    # acceptance rates even out (the end points stay fixed).
+    def _adapt_ladder(self, betas, rates):
+        import numpy as np
+        gaps = np.diff(np.log(betas))
+        total = gaps.sum()
+        if (total == 0): return betas
+        gaps = gaps * np.exp(rates - rates.mean())
+        gaps *= total / gaps.sum()
+        return betas[0] * np.exp(np.concatenate(([0], np.cumsum(gaps))))
+
+# A bounded collection of the lowest energy distinct states seen by a
+# local search, states are 1D uint8 arrays keyed by their raw bytes.
+class BestStates:
+    def __init__(self, size):
+        self.size = size
+        self.heap = []
+        self.keys = set()
+
+    # Offer a state (with its energy) to the collection.
+    def add(self, state, energy):
+        import heapq
+        key = state.tobytes()
+        if (key in self.keys): return
+        if (len(self.heap) < self.size):
+            heapq.heappush(self.heap, (-energy, key))
+            self.keys.add(key)
+        elif (energy < -self.heap[0][0]):
+            _, removed = heapq.heappushpop(self.heap, (-energy, key))
+            self.keys.discard(removed)
+            self.keys.add(key)
+
+    # Yield the states as a SampleSet in order of energy (exactly
+    # recomputed by the given "system").
+    def samples(self, system):
+        import numpy as np
+        if (len(self.heap) == 0): return
+        bits = np.array([np.frombuffer(key, dtype=np.uint8) for (_, key) in self.heap])
+        yield SampleSet(bits, system.energies(bits)).sort()
+
+# Run a local "search" from "restarts" + 1 starting states, first a
+# random state and then perturbations (a quarter of the bits flipped)
+# of the lowest energy state found so far. The search is called as
+# "search(state, energy, best_energy, pool, deadline)", it may change
+# "state" and must offer the states it reaches to the BestStates
+# "pool", then return the (bits, energy) of the lowest energy state it
+# reached and True if it passed the (time.time) "deadline". Yields the
+# "num_samples" lowest energy distinct states offered to the pool.
+def restarted_search(system, search, num_samples, restarts, time_limit, seed):
+    import numpy as np
+    import time
+    rng = np.random.default_rng(seed)
+    deadline = None if (time_limit is None) else time.time() + time_limit
+    pool = BestStates(num_samples)
+    best_bits = None
+    best_energy = float('inf')
+    for restart in range(restarts + 1):
+        if (best_bits is None):
+            state = rng.integers(0, 2, size=system.num_bits, dtype=np.uint8)
+        else:
+            state = best_bits.copy()
+            flips = rng.choice(system.num_bits, size=max(1, system.num_bits // 4), replace=False)
+            state[flips] ^= 1
+        energy = float(system.energies(state[None,:])[0])
+        pool.add(state, energy)
+        bits, energy, out_of_time = search(state, energy, best_energy, pool, deadline)
+        if (energy < best_energy): best_energy, best_bits = energy, bits.copy()
+        if out_of_time: break
+    yield from pool.samples(system)
+
+# Walk from "state" (with "energy") by single-bit tabu moves for at
+# most "iterations" moves, stopping after "stall_limit" moves that do
+# not improve on the walk. Flipped bits stay tabu for "tenure" moves
+# unless the flip beats "best_energy". Every state visited is offered
+# to the BestStates "pool" (when given). Returns the (bits, energy) of
+# the lowest energy state visited and True if it passed "deadline".
+def tabu_walk(system, state, energy, best_energy, tenure, iterations,
+              stall_limit, pool=None, deadline=None):
+    import numpy as np
+    import time
+    adjacency = system.adjacency()
+    state = state.copy()
+    field = system.local_fields(state[None,:])[0]
+    deltas = (1 - 2*state.astype(float)) * field
+    tabu_until = np.zeros(system.num_bits, dtype=np.int64)
+    walk_bits, walk_energy = state.copy(), energy
+    stall = 0
+    for move in range(iterations):
+        # Pick the best allowed move (tabu moves that beat the best are allowed).
+        allowed = (tabu_until <= move) | (energy + deltas < min(best_energy, walk_energy))
+        k = int(np.argmin(np.where(allowed, deltas, np.inf)))
+        if (not allowed[k]): break
+        # Flip the bit and update the delta table for its neighbors.
+        d = 1 - 2*int(state[k])
+        energy += deltas[k]
+        state[k] ^= 1
+        neighbors, weights = adjacency[k]
+        field[neighbors] += d * weights
+        deltas[neighbors] = (1 - 2*state[neighbors].astype(float)) * field[neighbors]
+        deltas[k] = -deltas[k]
+        tabu_until[k] = move + tenure + 1
+        if (pool is not None): pool.add(state, energy)
+        # Track the best state of the walk, stalls, and the deadline.
+        if (energy < walk_energy): walk_bits, walk_energy, stall = state.copy(), energy, 0
+        else:                      stall += 1
+        if (stall >= stall_limit): break
+        if (deadline is not None) and (time.time() > deadline):
+            return walk_bits, walk_energy, True
+    return walk_bits, walk_energy, False
+
+# A tabu search over single-bit flips. The energy change of flipping
+# every bit is kept in a delta table that is updated in O(degree) per
+# move, so each move picks the best non-tabu flip (or a tabu flip that
+# beats the best energy seen). After a flip, a bit stays tabu for
+# "tenure" moves. A walk stops after "iterations" moves or after
+# "stall_limit" moves without improvement, then the search restarts
+# from a perturbation of the best state found. The "num_samples"
+# lowest energy distinct states visited are produced. This sampler
+# provides the following keyword arguments:
+# 
+#    num_samples [10]    -- (integer) The number of distinct states.
+#    tenure [None]       -- (integer) Moves a flipped bit stays tabu,
+#                           min(20, num_bits // 4) by default.
+#    iterations [None]   -- (integer) Maximum moves per restart,
+#                           50 * num_bits by default.
+#    stall_limit [None]  -- (integer) Moves without improvement before
+#                           restarting, 5 * num_bits by default.
+#    restarts [10]       -- (integer) The number of restarts.
+#    time_limit [None]   -- (float) Wall-clock budget in seconds.
+#    seed [None]         -- (integer) Seed for the random generator.
+# 
+class TabuSearch(System):
+    # Run the search and yield the best distinct states visited.
+    def samples(self, num_samples=10, tenure=None, iterations=None,
+                stall_limit=None, restarts=10, time_limit=None, seed=None):
+        num_bits = self.num_bits
+        if (tenure is None): tenure = max(1, min(20, num_bits // 4))
+        if (iterations is None): iterations = 50 * num_bits
+        if (stall_limit is None): stall_limit = 5 * num_bits
+        # Each restart is one tabu walk.
+        def search(state, energy, best_energy, pool, deadline):
+            return tabu_walk(self, state, energy, best_energy, tenure,
+                             iterations, stall_limit, pool, deadline)
+        yield from restarted_search(self, search, num_samples, restarts, time_limit, seed)
+
+# A decomposing solver in the spirit of qbsolv, for QUBOs larger than
+# any single sub-solver can handle. Each pass grows windows of
+# "subproblem_size" strongly coupled bits, each seeded by the bit
+# whose flip lowers the energy the most among the bits not yet in a
+# window of this pass and extended by the neighbors with the largest
+# coupling to it. The bits outside a window are clamped to their
+# current values, the reduced sub-QUBO is solved with the "inner"
+# System, and its best state is written back when it lowers the
+# energy. After "stall_passes" passes without an improvement the full
+# state is refined by a tabu walk (see "TabuSearch") of "refine" moves,
+# and the passes continue while that lowers the energy. Each restart
+# begins from a perturbation of the best state. The "num_samples"
+# lowest energy distinct states reached are produced. This sampler
+# provides the following keyword arguments:
+# 
+#    num_samples [10]       -- (integer) The number of distinct states.
+#    subproblem_size [16]   -- (integer) Bits in each sub-QUBO.
+#    inner [ExhaustiveSearch] -- (System) The sub-QUBO solver.
+#    inner_kwargs [None]    -- (dict) Keyword arguments for the inner
+#                              "samples" method, exact enumeration of
+#                              one state for ExhaustiveSearch by default.
+#    stall_passes [2]       -- (integer) Passes without improvement
+#                              before refining.
+#    refine [None]          -- (integer) Moves of the tabu walk over the
+#                              full state, 10 * num_bits by default
+#                              (0 only decomposes).
+#    restarts [5]           -- (integer) The number of restarts.
+#    time_limit [None]      -- (float) Wall-clock budget in seconds.
+#    seed [None]            -- (integer) Seed for the random generator.
+# 
+class Decomposition(System):
+    # Run the decomposition and yield the best distinct states reached.
+    def samples(self, num_samples=10, subproblem_size=16,
+                inner=ExhaustiveSearch, inner_kwargs=None, stall_passes=2,
+                refine=None, restarts=5, time_limit=None, seed=None):
+        import time
+        num_bits = self.num_bits
+        size = max(1, min(subproblem_size, num_bits))
+        adjacency = self.adjacency()
+        if (inner_kwargs is None):
+            if issubclass(inner, ExhaustiveSearch): inner_kwargs = dict(num_samples=1, exact=True)
+            else:                                  inner_kwargs = dict()
+        if (refine is None): refine = 10 * num_bits
+        tenure = max(1, min(20, num_bits // 4))
+        # Each restart alternates decomposition passes with tabu walks.
+        def search(state, energy, best_energy, pool, deadline):
+            field = self.local_fields(state[None,:])[0]
+            while True:
+                stall = 0
+                while (stall < stall_passes):
+                    improved = False
+                    for window in self._windows(state, field, size):
+                        new_bits, new_energy = self._solve_window(
+                            state, field, window, inner, inner_kwargs)
+                        # Write back the sub-solution if it lowers the energy
+                        # (by more than rounding error).
+                        changed = window[new_bits != state[window]]
+                        if (len(changed) > 0) and (new_energy < energy - 1e-9*(1 + abs(energy))):
+                            for i in changed:
+                                neighbors, weights = adjacency[i]
+                                field[neighbors] += (1 - 2*int(state[i])) * weights
+                            state[window] = new_bits
+                            energy = float(self.energies(state[None,:])[0])
+                            pool.add(state, energy)
+                            improved = True
+                        if (deadline is not None) and (time.time() > deadline):
+                            return state, energy, True
+                    stall = 0 if improved else stall + 1
+                if (refine <= 0): return state, energy, False
+                # Refine the whole state, continue decomposing if it improved.
+                bits, walk_energy, out_of_time = tabu_walk(
+                    self, state, energy, best_energy, tenure, refine, refine, pool, deadline)
+                if (walk_energy >= energy - 1e-9*(1 + abs(energy))) or out_of_time:
+                    if (walk_energy < energy): state, energy = bits, walk_energy
+                    return state, energy, out_of_time
+                state[:] = bits
+                energy = float(self.energies(state[None,:])[0])
+                field = self.local_fields(state[None,:])[0]
+        yield from restarted_search(self, search, num_samples, restarts, time_limit, seed)
+
+    # Split the bits into windows of (at most) "size" bits for one pass.
+    # Each window starts from the remaining bit whose flip lowers the
+    # energy the most, then repeatedly adds the remaining neighbor of
+    # the window with the largest total coupling to it (or the next
+    # bit by flip impact when the window has no remaining neighbors).
+    def _windows(self, state, field, size):
+        import numpy as np
+        adjacency = self.adjacency()
+        order = np.argsort((1 - 2*state.astype(float)) * field, kind="stable").tolist()
+        remaining = np.ones(self.num_bits, dtype=bool)
+        windows = []
+        for seed_bit in order:
+            if (not remaining[seed_bit]): continue
+            window = [seed_bit]
+            remaining[seed_bit] = False
+            coupling = {}
+            while (len(window) < size):
+                neighbors, weights = adjacency[window[-1]]
+                for (n, w) in zip(neighbors.tolist(), np.abs(weights).tolist()):
+                    if remaining[n]: coupling[n] = coupling.get(n, 0) + w
+                if (len(coupling) > 0):
+                    b = max(coupling, key=coupling.get)
+                    coupling.pop(b)
+                else:
+                    b = next((b for b in order if remaining[b]), None)
+                    if (b is None): break
+                remaining[b] = False
+                window.append(b)
+            windows.append(np.sort(np.array(window)))
+        return windows
+
+    # Solve the sub-QUBO over the bits in "window" with all other bits
+    # clamped to "state", return the best (window bits, full energy).
+    def _solve_window(self, state, field, window, inner, inner_kwargs):
+        import numpy as np
+        from qaml.qubo import QUBO
+        sub_state = state[window].astype(float)
+        # Gather the couplings within the window from the sparse adjacency.
+        position = np.full(self.num_bits, -1)
+        position[window] = np.arange(len(window))
+        quadratic = np.zeros((len(window), len(window)))
+        adjacency = self.adjacency()
+        for i, b in enumerate(window):
+            neighbors, weights = adjacency[b]
+            inside = (neighbors > b) & (position[neighbors] >= 0)
+            quadratic[i, position[neighbors[inside]]] = weights[inside]
+        # Linear terms absorb the interactions with the clamped bits.
+        linear = field[window] - (quadratic + quadratic.T) @ sub_state
+        # The constant is the energy with all window bits off.
+        clamped = state.copy()
+        clamped[window] = 0
+        constant = float(self.energies(clamped[None,:])[0])
+        sub_qubo = QUBO()
+        for i in range(len(window)):
+            sub_qubo[i] = float(linear[i])
+            for j in np.nonzero(quadratic[i])[0]:
+                sub_qubo[(i,int(j))] = float(quadratic[i,j])
+        sub_qubo["c"] = constant
+        system = inner(sub_qubo, constant=constant)
+        results = SampleSet.collect(system.samples(**inner_kwargs))
+        best = int(np.argmin(results.energies))
+        return results.bits[best], results.energies[best]
 
 # A wrapper for the crappy provided solver by QBSolv, this defines a
 # more readable interface for QBSolv, the built-in simulator.
@@ -81,7 +1007,7 @@ class QBSolve(System):
     def samples(self, num_samples=20):
         from dwave_qbsolv import QBSolv
         for i in range(num_samples):
-            system = QBSolv().sample_qubo(self.coefficients)
+            system = QBSolv().sample_qubo(dict(self.coefficients))
             for out in system.samples(1): pass
             # Construct a "Sample" output and return it.
             output = Sample()
@@ -103,44 +1029,83 @@ class QBSolve(System):
 #    verbose [True]        -- (bool) True shows descriptive printouts.
 #    fix_chains [False]    -- (bool) True uses manual chain fixing,
 #                             WARNING: outputs are less varied when True.
+#    embedding_cache [True] -- (bool or DiskCache) Reuse embeddings of
+#                             the same coupling graph across runs.
+#    embedding_score [None] -- (function) Score of an embedding to
+#                             minimize, the max chain length by default.
+#    embedding_target [None] -- (number) Stop searching once an
+#                             embedding scores this low.
+#    embedding_budget [None] -- (float) Seconds to search embeddings.
+#    embedding_workers [None] -- (integer) Processes searching embeddings.
+#    embedding [None]      -- (dict) A precomputed embedding to use.
+#    session [None]        -- (SamplerSession or sampler) The sampler
+#                             to use, a shared session by default.
 # 
 # Returns a generator of ([bit values], energy) pairs.
 # 
 class QuantumAnnealer(System):
+    # Get a sampler session, the shared default session unless a
+    # session (or a structured sampler) is provided.
+    def session(self, session=None):
+        from qaml.samplers import as_session
+        return as_session(session)
+
+    # Get the best of multiple seeded embeddings of this system onto the
+    # sampler, searched in parallel within the time budget (reusing a
+    # cached embedding when this coupling graph was embedded before).
+    def embedding(self, session=None, embedding_attempts=5, embedding_cache=True,
+                  embedding_score=None, embedding_target=None,
+                  embedding_budget=None, embedding_workers=None,
+                  verbose=True, **sample_kwargs):
+        from qaml.embedding import find_best_embedding
+        session = self.session(session)
+        return find_best_embedding(
+            self._qubo_no_zeros(), session.edgelist, attempts=embedding_attempts,
+            cache=embedding_cache, verbose=verbose, score=embedding_score,
+            target_score=embedding_target, budget=embedding_budget,
+            workers=embedding_workers, target_key=session.target_key)
+
+    # Construct a QUBO with no 0-valued coefficients in it (the
+    # couplings are already sparse, this drops zero linear terms).
+    def _qubo_no_zeros(self):
+        return {c:self.coefficients[c] for c in self.coefficients
+                if (self.coefficients[c] != 0)}
+
+    # The embedding (and how it is searched for) is left out of cache
+    # keys, so cached samples are reused without finding an embedding.
+    _uncached_arguments = System._uncached_arguments + (
+        "embedding", "embedding_attempts", "embedding_cache", "embedding_score",
+        "embedding_target", "embedding_budget", "embedding_workers")
+
+    # Identify the hardware by its graph (not the session object) in
+    # the content address of a call to "samples".
+    def cache_key(self, num_samples, session=None, **sample_kwargs):
+        return super().cache_key(num_samples, hardware=self.session(session).target_key,
+                                 **sample_kwargs)
+
+    # Find the embedding ahead of sampling.
+    def prepare(self, **sample_kwargs):
+        sample_kwargs["session"] = self.session(sample_kwargs.get("session"))
+        if (sample_kwargs.get("embedding") is None):
+            sample_kwargs["embedding"] = self.embedding(**sample_kwargs)
+        return sample_kwargs
+
     # Do the pecuiliar steps necessary to generate samples from QBSolv.
     def samples(self, num_samples=20, embedding_attempts=5, 
-                chain_strength=(1/2), verbose=True, fix_chains=False):
-        # Import required local modules.
-        from qaml.qubo import qubo_ising_rescale_factor
-        from qaml.setup import token
-        # Construct a sampler over a real quantum annealer.
-        from dwave.system.samplers import DWaveSampler
-        from minorminer import find_embedding
-        sampler = DWaveSampler(token=token)
-        # Construct an automatic embedding over the machine architecture.
-        _, edgelist, adjacency = sampler.structure
-        # Attempt to embed multiple times (with seeds for
-        # repeatability), and take the best embedding found.
-        best_embedding = None
-        smallest_max_len = float('inf')
-        # Construct a QUBO with no 0-valued coefficients in it.
-        qubo_no_zeros = {c:self.coefficients[c] for c in self.coefficients
-                         if (self.coefficients[c] != 0)}
-        # Cycle embedding attempts.
-        for i in range(embedding_attempts):
-            embedding = find_embedding(qubo_no_zeros, edgelist, random_seed=i)
-            # Count the number of chains of each length.
-            lens = list(map(len, embedding.values()))
-            # Check to see if this is the best embedding yet.
-            if (len(lens) > 0) and (max(lens) < smallest_max_len):
-                smallest_max_len = max(lens)
-                best_embedding = embedding
-        # Verify that there were embeddings discovered.
-        if (type(best_embedding) == type(None)):
-            from qaml.exceptions import UnsolvableSystem
-            raise(UnsolvableSystem("No physical embeddings could be discovered for the provided QUBO."))
-        # Use the best embedding found.
-        embedding = best_embedding
+                chain_strength=(1/2), verbose=True, fix_chains=False,
+                embedding_cache=True, embedding_score=None,
+                embedding_target=None, embedding_budget=None,
+                embedding_workers=None, embedding=None, session=None):
+        # Use the shared sampler session (one connection to the solver
+        # with its structure cached) unless one (or a sampler) was provided.
+        session = self.session(session)
+        sampler = session.sampler
+        adjacency = session.adjacency
+        qubo_no_zeros = self._qubo_no_zeros()
+        if (embedding is None):
+            embedding = self.embedding(
+                session, embedding_attempts, embedding_cache, embedding_score,
+                embedding_target, embedding_budget, embedding_workers, verbose)
         lens = list(map(len, embedding.values()))
         if verbose:
             print()
@@ -151,13 +1116,13 @@ class QuantumAnnealer(System):
                 count = lens.count(i)
                 print("", i, "chain --", "#"*count)
             print()
-            print(f"Using embedding with {sum(lens[k] for k in lens)} qubits:")
+            print(f"Using embedding with {sum(lens)} qubits:")
             for i in sorted(embedding):
                 print("", i, embedding[i])
             print()
         # Automatically set the chain strength based on the rescale
         # factor that will be applied to the Ising model.
-        rescale_factor = qubo_ising_rescale_factor(self.coefficients)
+        rescale_factor = self.problem.rescale_factor
         chain_strength *= rescale_factor
         if verbose:
             print(f"Ising rescale factor: {rescale_factor}")
@@ -190,16 +1155,94 @@ class QuantumAnnealer(System):
                 sampler, embedding)
             response = system_composite.sample_qubo(
                 qubo_no_zeros, num_reads=num_samples, chain_strength=chain_strength)
-        # Cycle through the results and yield them to the caller.
-        for out in response.data():
-            # Get the output from the data.
-            output = Sample()
-            output.bits = (out.sample[b] for b in sorted(out.sample))
-            output.energy = out.energy + self.constant
-            output.chain_break_fraction = out.chain_break_fraction
-            output.occurrence = out.num_occurrences
-            # Yield the output.
-            yield output
+        # Yield all of the results to the caller (with bits in variable order).
+        record = response.record
+        columns = [response.variables.index(v) for v in sorted(response.variables)]
+        yield SampleSet(record.sample[:,columns], record.energy + self.constant,
+                        record.chain_break_fraction, record.num_occurrences)
 
 
+# A System that replays previously collected samples (like the reads
+# of one problem from a packed job), yielding them from "samples".
+class Recorded(System):
+    def samples(self, num_samples=None, recorded=()):
+        if (type(recorded) == SampleSet): yield recorded
+        else:                             yield from recorded
+
+# Sample many (small) problems on the quantum annealer in as few jobs
+# as possible, by embedding them into disjoint regions of the hardware
+# graph (see "qaml.embedding.pack_embeddings") and submitting each
+# group of problems as one job. Every problem gets "num_samples" reads
+# of its job. Problems may be Systems, compiled Problems, or QUBOs.
+# Each problem is normalized by its Ising rescale factor before it is
+# packed, so that it keeps the precision it would have had in a job of
+# its own, and "chain_strength" is relative to that (as it is for the
+# QuantumAnnealer). Returns one SampleSet per problem (in order) with
+# energies computed by the problem's System and per-problem chain
+# break fractions. Problems without any nonzero coefficient are not
+# submitted, every state is a ground state so they get all-zero bits.
+def sample_packed(problems, num_samples=20, chain_strength=(1/2),
+                  embedding_attempts=1, session=None, verbose=False,
+                  **embedding_kwargs):
+    import numpy as np
+    import dimod
+    from dwave.embedding import embed_bqm, unembed_sampleset
+    from dwave.embedding.chain_breaks import majority_vote
+    from qaml.qubo import Problem
+    from qaml.embedding import pack_embeddings
+    from qaml.samplers import as_session
+    session = as_session(session)
+    # Get a System (and its nonzero coefficients) for every problem.
+    systems = []
+    for p in problems:
+        if (not isinstance(p, System)):
+            if (type(p) != Problem): p = Problem(p)
+            p = System(p, constant=p.constant)
+        systems.append(p)
+    qubos = [{c:s.coefficients[c] for c in s.coefficients
+              if (s.coefficients[c] != 0)} for s in systems]
+    results = [None] * len(systems)
+    for i, s in enumerate(systems):
+        if (len(qubos[i]) == 0):
+            bits = np.zeros((1, s.num_bits), dtype=np.uint8)
+            results[i] = SampleSet(bits, s.energies(bits), occurrences=[num_samples])
+    # Pack the problems that have coefficients (indexed by their position).
+    nonzero = [i for i in range(len(systems)) if (results[i] is None)]
+    if (len(nonzero) == 0): return results
+    groups = pack_embeddings([qubos[i] for i in nonzero], session.edgelist,
+                             attempts=embedding_attempts, verbose=verbose,
+                             **embedding_kwargs)
+    groups = [{nonzero[j] : embedding for (j, embedding) in group.items()}
+              for group in groups]
+    for group in groups:
+        # Combine the (normalized) problems of this group into one BQM
+        # whose variables are labeled (problem index, bit index).
+        bqm = dimod.BinaryQuadraticModel("BINARY")
+        embedding = {}
+        sources = {}
+        for i in group:
+            rescale_factor = systems[i].problem.rescale_factor
+            scale = (1 / rescale_factor) if (rescale_factor > 0) else 1
+            sources[i] = dimod.BinaryQuadraticModel.from_qubo(
+                {c: w * scale for (c, w) in qubos[i].items()})
+            for (u, v), w in qubos[i].items():
+                if (u == v): bqm.add_linear((i,u), w * scale)
+                else:        bqm.add_quadratic((i,u), (i,v), w * scale)
+            embedding.update({(i,v) : chain for (v, chain) in group[i].items()})
+        embedded = embed_bqm(bqm, embedding, session.adjacency,
+                             chain_strength=chain_strength,
+                             smear_vartype=dimod.SPIN)
+        response = session.sampler.sample(embedded, num_reads=num_samples)
+        # Split the reads back into each problem of the group.
+        for i in group:
+            unembedded = unembed_sampleset(
+                response, group[i], sources[i], chain_break_method=majority_vote,
+                chain_break_fraction=True)
+            record = unembedded.record
+            bits = np.zeros((len(record), systems[i].num_bits), dtype=np.uint8)
+            bits[:,list(unembedded.variables)] = record.sample
+            results[i] = SampleSet(bits, systems[i].energies(bits),
+                                   record.chain_break_fraction,
+                                   record.num_occurrences)
+    return results
 